@@ -10,6 +10,7 @@ from .summarizer_agent import SummarizerAgent
 from .synthesizer_agent import SynthesizerAgent
 from .survey_writer_agent import SurveyWriterAgent
 from .reproducible_agent import ReproducibleOpenAIAgent
+from .model_router import ModelRouter, AgentPool
 
 __all__ = [
     'PDFMinerAgent',
@@ -18,4 +19,6 @@ __all__ = [
     'SynthesizerAgent',
     'SurveyWriterAgent',
     'ReproducibleOpenAIAgent',
+    'ModelRouter',
+    'AgentPool',
 ]
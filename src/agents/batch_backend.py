@@ -0,0 +1,141 @@
+"""
+Batch backends for offline summarization jobs.
+
+A job is a JSONL file of chat-completion requests in the OpenAI Batch API format
+({"custom_id", "method", "url", "body"} per line). Backends submit the file,
+report its status when polled, and return the path of a JSONL results file
+({"custom_id", "response": {"status_code", "body"}, "error"} per line).
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+# Batch states after which polling stops
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchBackend:
+    """Interface for batch submission backends."""
+
+    name = "base"
+
+    def submit(self, job_file):
+        """Submit a job file and return its batch id."""
+        raise NotImplementedError
+
+    def poll(self, batch_id):
+        """Return the current status of a batch (see TERMINAL_STATES)."""
+        raise NotImplementedError
+
+    def fetch_results(self, batch_id, output_file):
+        """Download the results of a completed batch to output_file and return its path."""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Submits jobs through the OpenAI Batch API (/v1/chat/completions, 24h window)."""
+
+    name = "openai"
+
+    def __init__(self, api_key, completion_window="24h"):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
+        self.completion_window = completion_window
+        self._batches = {}
+
+    def submit(self, job_file):
+        with open(job_file, 'rb') as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        self._batches[batch.id] = batch
+        return batch.id
+
+    def poll(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        self._batches[batch_id] = batch
+        return batch.status
+
+    def fetch_results(self, batch_id, output_file):
+        batch = self._batches.get(batch_id) or self.client.batches.retrieve(batch_id)
+        with open(output_file, 'wb') as out:
+            # Failed requests are reported in a separate error file with the same line format
+            for file_id in (batch.output_file_id, getattr(batch, 'error_file_id', None)):
+                if file_id:
+                    out.write(self.client.files.content(file_id).read())
+        return output_file
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """
+    File-based stand-in for testing batch mode without network access.
+    Jobs are copied into work_dir and processed on the first poll by a responder
+    callable (request body -> response text); results use the OpenAI output format.
+    """
+
+    name = "local"
+
+    def __init__(self, work_dir, responder=None):
+        """
+        :param work_dir: Directory holding submitted jobs and their results
+        :param responder: Callable(body) -> str; defaults to echoing the start of the prompt
+        """
+        self.work_dir = work_dir
+        self.responder = responder or self._echo
+        os.makedirs(work_dir, exist_ok=True)
+
+    @staticmethod
+    def _echo(body):
+        prompt = body["messages"][-1]["content"]
+        return f"[local batch] {prompt.split('Text:', 1)[-1].strip()[:300]}"
+
+    def _path(self, batch_id, name):
+        return os.path.join(self.work_dir, batch_id, name)
+
+    def submit(self, job_file):
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.work_dir, batch_id))
+        shutil.copyfile(job_file, self._path(batch_id, "input.jsonl"))
+        return batch_id
+
+    def poll(self, batch_id):
+        results = self._path(batch_id, "output.jsonl")
+        if not os.path.exists(results):
+            tmp = results + ".tmp"
+            with open(self._path(batch_id, "input.jsonl")) as src, open(tmp, 'w') as out:
+                for line in src:
+                    request = json.loads(line)
+                    body = request["body"]
+                    text = self.responder(body)
+                    prompt_tokens = len(body["messages"][-1]["content"].split())
+                    completion_tokens = len(text.split())
+                    out.write(json.dumps({
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": {
+                            "model": body["model"],
+                            "choices": [{"message": {"role": "assistant", "content": text}}],
+                            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                      "total_tokens": prompt_tokens + completion_tokens}
+                        }},
+                        "error": None
+                    }) + "\n")
+            os.replace(tmp, results)
+        return "completed"
+
+    def fetch_results(self, batch_id, output_file):
+        shutil.copyfile(self._path(batch_id, "output.jsonl"), output_file)
+        return output_file
+
+
+def create_batch_backend(name, work_dir, api_key=None):
+    """Build a batch backend by name ("openai" or "local")."""
+    if name == "openai":
+        return OpenAIBatchBackend(api_key)
+    if name == "local":
+        return LocalFileBatchBackend(os.path.join(work_dir, "local_backend"))
+    raise ValueError(f"Unknown batch backend: {name}")
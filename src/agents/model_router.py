@@ -0,0 +1,102 @@
+"""
+ModelRouter: per-agent model routing with a dedicated client pool per role.
+Sends per-paper summarization to a fast/cheap model and reserves the large model
+for synthesis and survey writing.
+"""
+
+import queue
+from contextlib import contextmanager
+
+from moya.agents.openai_agent import OpenAIAgentConfig
+
+from src import config
+from src.agents.reproducible_agent import ReproducibleOpenAIAgent
+from src.utils.trace_logger import get_trace_logger
+
+
+class AgentPool:
+    """
+    Fixed-size pool of ReproducibleOpenAIAgent instances serving one role.
+    Each instance owns its own OpenAI client; the pool size is the role's concurrency limit.
+    """
+
+    def __init__(self, role, model_name, concurrency, factory):
+        """
+        :param role: Role served by the pool (e.g. "summarizer")
+        :param model_name: Model used by every agent in the pool
+        :param concurrency: Number of agents, i.e. maximum concurrent calls
+        :param factory: Callable(role, model_name, index) -> ReproducibleOpenAIAgent
+        """
+        self.role = role
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self._agents = queue.Queue()
+        for i in range(concurrency):
+            self._agents.put(factory(role, model_name, i))
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an agent for one call, blocking while all agents are busy."""
+        agent = self._agents.get()
+        try:
+            yield agent
+        finally:
+            self._agents.put(agent)
+
+    def handle_message(self, message, **kwargs):
+        """Send a message through any free agent in the pool."""
+        with self.acquire() as agent:
+            return agent.handle_message(message, **kwargs)
+
+
+class ModelRouter:
+    """
+    Builds one AgentPool per role from config.AGENT_MODELS / config.AGENT_CONCURRENCY,
+    with optional per-run overrides.
+    """
+
+    def __init__(self, api_key, models=None, concurrency=None,
+                 temperature=config.DEFAULT_TEMPERATURE, seed=config.DEFAULT_SEED):
+        """
+        :param api_key: OpenAI API key
+        :param models: Role -> model overrides (e.g. {"summarizer": "gpt-4o-mini"})
+        :param concurrency: Role -> concurrency overrides
+        :param temperature: Sampling temperature for every role
+        :param seed: Seed for every role
+        """
+        self.api_key = api_key
+        self.models = {**config.AGENT_MODELS, **{k: v for k, v in (models or {}).items() if v}}
+        self.concurrency = {**config.AGENT_CONCURRENCY, **{k: v for k, v in (concurrency or {}).items() if v}}
+        self.temperature = temperature
+        self.seed = seed
+        self._pools = {}
+        self.trace_logger = get_trace_logger()
+        self.trace_logger.log_agent_init("ModelRouter", self.describe())
+
+    def _build_agent(self, role, model_name, index):
+        return ReproducibleOpenAIAgent(
+            config=OpenAIAgentConfig(
+                agent_name=f"{config.AGENT_NAME}_{role}",
+                description=f"LLM agent for {role.replace('_', ' ')}",
+                api_key=self.api_key,
+                model_name=model_name,
+                agent_type=config.AGENT_TYPE,
+                is_streaming=config.IS_STREAMING
+            ),
+            temperature=self.temperature,
+            seed=self.seed
+        )
+
+    def pool(self, role):
+        """Return the AgentPool for a role, creating it on first use."""
+        if role not in self._pools:
+            if role not in self.models:
+                raise ValueError(f"No model configured for role: {role}")
+            self._pools[role] = AgentPool(role, self.models[role], self.concurrency.get(role, 1),
+                                          self._build_agent)
+        return self._pools[role]
+
+    def describe(self):
+        """Role -> model/concurrency mapping, recorded in the run config for reproducibility."""
+        return {role: {"model": model, "concurrency": self.concurrency.get(role, 1)}
+                for role, model in self.models.items()}
@@ -4,68 +4,233 @@ Stub for assignment structure.
 """
 
 
+import itertools
 import os
+import queue
+import re
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from urllib.parse import urlencode
 from xml.etree import ElementTree
+from src import config
 from src.utils.trace_logger import get_trace_logger
 
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+
+
+class ByteBudget:
+    """
+    Blocks new downloads while the bytes reserved for queued and running ones would exceed a limit.
+    A single download larger than the whole budget is still allowed when nothing else is in flight.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        with self._cond:
+            while self.in_flight and self.in_flight + n > self.max_bytes:
+                self._cond.wait()
+            self.in_flight += n
+
+    def resize(self, held, n):
+        """
+        Replace a held reservation with n bytes (e.g. the actual Content-Length) and return n.
+        Never blocks: the download is already admitted, so growth only delays later acquires.
+        """
+        with self._cond:
+            self.in_flight += n - held
+            if n < held:
+                self._cond.notify_all()
+        return n
+
+    def release(self, n):
+        with self._cond:
+            self.in_flight -= n
+            self._cond.notify_all()
+
+
 class PDFMinerAgent:
     def __init__(self, topic, download_dir):
         self.topic = topic
         self.download_dir = download_dir
         os.makedirs(download_dir, exist_ok=True)
+        self._local = threading.local()
+        self._paper_info = {}
         self.trace_logger = get_trace_logger()
         self.trace_logger.log_agent_init("PDFMinerAgent", {"topic": topic, "download_dir": download_dir})
 
-    def mine_pdfs(self, max_papers=6):
+    def _session(self):
+        """Per-thread HTTP session so each download worker reuses its own connections."""
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def paper_metadata(self, file_path):
+        """
+        Bibliographic metadata (arxiv_id, title, authors, published) for a downloaded PDF,
+        or an empty dict if the file was not downloaded by this agent.
+        """
+        return dict(self._paper_info.get(file_path, {}))
+
+    def mine_pdfs(self, max_papers=config.DEFAULT_MAX_PAPERS):
         """
         Search arXiv for the topic and download up to max_papers PDFs.
         Returns a list of file paths to downloaded PDFs.
         """
+        return [path for _, path in sorted(self.iter_pdfs(max_papers))]
+
+    def iter_pdfs(self, max_papers=config.DEFAULT_MAX_PAPERS, page_size=config.ARXIV_PAGE_SIZE):
+        """
+        Search arXiv for the topic and yield (rank, file_path) for each PDF as soon as it is downloaded.
+
+        Downloads start as soon as each Atom entry is parsed, before the rest of the feed
+        arrives, and the next result page is fetched while the current one downloads.
+        Bytes reserved for queued and running downloads are bounded by config.PREFETCH_MAX_INFLIGHT_BYTES,
+        so the search stops prefetching pages while the download queue is full.
+        Rank is the 0-based position in the search results; results arrive in completion order.
+        """
         self.trace_logger.log_agent_action("PDFMinerAgent", "search_arxiv",
-                                          {"topic": self.topic, "max_papers": max_papers})
-        # Search arXiv API
+                                          {"topic": self.topic, "max_papers": max_papers,
+                                           "page_size": page_size})
+        started = time.perf_counter()
+        budget = ByteBudget(config.PREFETCH_MAX_INFLIGHT_BYTES)
+        results = queue.Queue()
+        downloaded = 0
+        with ThreadPoolExecutor(max_workers=config.PREFETCH_WORKERS) as downloads, \
+                ThreadPoolExecutor(max_workers=1) as searches:
+            searches.submit(self._search_all, max_papers, page_size, downloads, budget, results)
+            expected = None
+            received = 0
+            while expected is None or received < expected:
+                kind, rank, value = results.get()
+                if kind == "search_done":
+                    expected = value
+                    continue
+                received += 1
+                if value is None:
+                    continue
+                downloaded += 1
+                if downloaded == 1:
+                    self.trace_logger.log_agent_action("PDFMinerAgent", "first_pdf_ready", {
+                        "file_path": value,
+                        "seconds_since_search": round(time.perf_counter() - started, 3)
+                    })
+                yield rank, value
+
+        self.trace_logger.log_agent_action("PDFMinerAgent", "mining_complete",
+                                          {"downloaded": downloaded, "requested": max_papers})
+
+    def _search_all(self, max_papers, page_size, downloads, budget, results):
+        """
+        Fetch result pages until max_papers entries are found, submitting each entry's
+        download as soon as it is parsed. Always reports the number of submitted downloads.
+        """
+        ranks = itertools.count()
+        submitted = 0
+        try:
+            start = 0
+            while submitted < max_papers:
+                if start:
+                    time.sleep(config.ARXIV_PAGE_DELAY)  # arXiv API etiquette between page requests
+                count = min(page_size, max_papers - submitted)
+                entries = 0
+                # closing() releases the streamed response when we stop before the end of the page
+                with closing(self._search_page(start, count)) as page:
+                    for entry in page:
+                        # Every entry counts towards the page size; only ones with a PDF link are downloaded
+                        entries += 1
+                        if not entry["pdf_url"]:
+                            continue
+                        # Reserve before queueing so queued downloads and page prefetch are bounded by bytes
+                        reserved = config.PREFETCH_PDF_SIZE_ESTIMATE
+                        budget.acquire(reserved)
+                        try:
+                            downloads.submit(self._download, entry, next(ranks), budget, reserved, results)
+                        except Exception:
+                            budget.release(reserved)
+                            raise
+                        submitted += 1
+                        if submitted >= max_papers:
+                            break
+                self.trace_logger.log_agent_action("PDFMinerAgent", "search_page_parsed",
+                                                  {"start": start, "entries": entries})
+                if entries < count:
+                    break  # No more results
+                start += count
+        except Exception as e:
+            print(f"arXiv search error: {e}")
+            self.trace_logger.log_error("PDFMinerAgent", f"arXiv search error: {str(e)}")
+        finally:
+            results.put(("search_done", None, submitted))
+
+    def _search_page(self, start, count):
+        """
+        Stream one arXiv Atom result page and yield entry dicts (pdf_url, arxiv_id, title,
+        authors, published) in rank order as entries are parsed. pdf_url is None for entries
+        without a PDF link. The response is closed even if the caller stops early.
+        """
         base_url = "http://export.arxiv.org/api/query?"
         query = {
             "search_query": f"all:{self.topic}",
-            "start": 0,
-            "max_results": max_papers
+            "start": start,
+            "max_results": count
         }
         url = base_url + urlencode(query)
-        response = requests.get(url)
-        if response.status_code != 200:
-            print(f"arXiv API error: {response.status_code}")
-            self.trace_logger.log_error("PDFMinerAgent", f"arXiv API error: {response.status_code}")
-            return []
-        # Parse XML
-        root = ElementTree.fromstring(response.content)
-        ns = {'atom': 'http://www.w3.org/2005/Atom'}
-        entries = root.findall('atom:entry', ns)
-        pdf_links = []
-        for entry in entries:
-            for link in entry.findall('atom:link', ns):
-                if link.attrib.get('title') == 'pdf':
-                    pdf_links.append(link.attrib['href'])
-        # Download PDFs
-        file_paths = []
-        for i, pdf_url in enumerate(pdf_links):
-            try:
-                pdf_resp = requests.get(pdf_url)
+        with self._session().get(url, stream=True, timeout=config.HTTP_TIMEOUT) as response:
+            if response.status_code != 200:
+                print(f"arXiv API error: {response.status_code}")
+                self.trace_logger.log_error("PDFMinerAgent", f"arXiv API error: {response.status_code}")
+                return
+            response.raw.decode_content = True
+            for _, elem in ElementTree.iterparse(response.raw, events=("end",)):
+                if elem.tag != ATOM_NS + 'entry':
+                    continue
+                abs_url = elem.findtext(ATOM_NS + 'id', '')
+                yield {
+                    "pdf_url": next((link.attrib['href'] for link in elem.findall(ATOM_NS + 'link')
+                                     if link.attrib.get('title') == 'pdf'), None),
+                    # Versionless id, so later versions of a paper map to the same corpus row
+                    "arxiv_id": re.sub(r"v\d+$", "", abs_url.rsplit('/abs/', 1)[-1]) or None,
+                    "title": " ".join(elem.findtext(ATOM_NS + 'title', '').split()),
+                    "authors": [author.findtext(ATOM_NS + 'name', '') for author in elem.findall(ATOM_NS + 'author')],
+                    "published": elem.findtext(ATOM_NS + 'published')
+                }
+                elem.clear()
+
+    def _download(self, entry, rank, budget, reserved, results):
+        """
+        Download one PDF and report (rank, path or None) to results. reserved is the byte budget
+        taken when the download was queued; it is adjusted to the Content-Length and always released.
+        """
+        pdf_url = entry["pdf_url"]
+        file_path = None
+        try:
+            with self._session().get(pdf_url, stream=True, timeout=config.HTTP_TIMEOUT) as pdf_resp:
                 if pdf_resp.status_code == 200:
-                    file_path = os.path.join(self.download_dir, f"paper_{i+1}.pdf")
-                    with open(file_path, 'wb') as f:
-                        f.write(pdf_resp.content)
-                    file_paths.append(file_path)
+                    content_length = pdf_resp.headers.get('Content-Length')
+                    if content_length:
+                        reserved = budget.resize(reserved, int(content_length))
+                    path = os.path.join(self.download_dir, f"paper_{rank+1}.pdf")
+                    with open(path + ".part", 'wb') as f:
+                        for chunk in pdf_resp.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                    os.replace(path + ".part", path)
+                    file_path = path
+                    self._paper_info[file_path] = {k: v for k, v in entry.items() if k != "pdf_url"}
                     self.trace_logger.log_pdf_operation("PDFMinerAgent", "download", file_path, success=True)
                 else:
                     print(f"Failed to download {pdf_url}")
-                    self.trace_logger.log_pdf_operation("PDFMinerAgent", "download", pdf_url, 
+                    self.trace_logger.log_pdf_operation("PDFMinerAgent", "download", pdf_url,
                                                        success=False, error=f"HTTP {pdf_resp.status_code}")
-            except Exception as e:
-                print(f"Error downloading {pdf_url}: {e}")
-                self.trace_logger.log_error("PDFMinerAgent", f"Error downloading {pdf_url}: {str(e)}")
-        
-        self.trace_logger.log_agent_action("PDFMinerAgent", "mining_complete", 
-                                          {"downloaded": len(file_paths), "requested": max_papers})
-        return file_paths
+        except Exception as e:
+            print(f"Error downloading {pdf_url}: {e}")
+            self.trace_logger.log_error("PDFMinerAgent", f"Error downloading {pdf_url}: {str(e)}")
+        finally:
+            budget.release(reserved)
+            results.put(("download", rank, file_path))
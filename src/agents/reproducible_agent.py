@@ -2,8 +2,13 @@
 Custom OpenAI Agent wrapper that supports temperature and seed for reproducibility.
 """
 
+import threading
+import time
+from contextlib import contextmanager
+
 from moya.agents.openai_agent import OpenAIAgent, OpenAIAgentConfig
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
 
 
 class ReproducibleOpenAIAgent(OpenAIAgent):
@@ -23,6 +28,36 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
         super().__init__(config)
         self.temperature = temperature
         self.seed = seed
+        self.last_usage = None  # Token usage of the most recent non-streaming call
+        self.model_override = None  # Temporarily serve calls from another model (e.g. under budget pressure)
+        self.concurrency = 1
+        self.token_callback = None  # Called with each content token while streaming
+        self._acquire_lock = threading.Lock()
+    
+    @contextmanager
+    def acquire(self):
+        """
+        Single-agent counterpart of AgentPool.acquire(): yields this agent,
+        serializing concurrent callers since per-call state lives on the instance.
+        """
+        with self._acquire_lock:
+            yield self
+    
+    @contextmanager
+    def stream_to(self, callback):
+        """
+        Stream responses inside this block, passing each content token to callback.
+        A None callback leaves the agent's streaming mode unchanged.
+        """
+        if callback is None:
+            yield self
+            return
+        previous = self.is_streaming
+        self.is_streaming, self.token_callback = True, callback
+        try:
+            yield self
+        finally:
+            self.is_streaming, self.token_callback = previous, None
     
     def get_response(self, conversation):
         """
@@ -36,12 +71,16 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
             dict: Message from the assistant, which may include 'tool_calls'.
         """
         trace_logger = get_trace_logger()
+        token_meter = get_token_meter()
+        token_meter.check()
+        self.last_usage = None
+        model = self.model_override or self.model_name
         
         # Log the LLM request
         user_message = next((msg['content'] for msg in reversed(conversation) if msg['role'] == 'user'), '')
         trace_logger.log_llm_request(
             agent_name=self.agent_name,
-            model=self.model_name,
+            model=model,
             prompt=user_message,
             temperature=self.temperature,
             seed=self.seed
@@ -49,24 +88,43 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
         
         if self.is_streaming:
             # Streaming mode with temperature and seed
+            start_time = time.perf_counter()
             response = self.client.chat.completions.create(
-                model=self.model_name,
+                model=model,
                 messages=conversation,
                 tools=self.get_tool_definitions() or None,
                 tool_choice=self.tool_choice if self.tool_registry else None,
                 temperature=self.temperature,
                 seed=self.seed,
-                stream=True
+                stream=True,
+                stream_options={"include_usage": True}
             )
             response_text = ""
             tool_calls = []
             current_tool_call = None
+            usage = None
+            first_token_logged = False
             
             for chunk in response:
+                # The final chunk carries usage and no choices
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
                 delta = chunk.choices[0].delta
                 if delta:
-                    if delta.content is not None:
+                    if delta.content:
+                        if not first_token_logged:
+                            first_token_logged = True
+                            trace_logger.log_custom(
+                                'llm_first_token',
+                                agent=self.agent_name,
+                                model=model,
+                                ttft_ms=round((time.perf_counter() - start_time) * 1000, 1)
+                            )
                         response_text += delta.content
+                        if self.token_callback:
+                            self.token_callback(delta.content)
                         
                     if delta.tool_calls:
                         for tool_call_delta in delta.tool_calls:
@@ -97,10 +155,27 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
                 result["tool_calls"] = tool_calls
             
             # Log the LLM response (streaming)
+            tokens = None
+            if usage is not None:
+                tokens = {
+                    'prompt': usage.prompt_tokens,
+                    'completion': usage.completion_tokens,
+                    'total': usage.total_tokens
+                }
+            self.last_usage = tokens
             trace_logger.log_llm_response(
                 agent_name=self.agent_name,
-                response=response_text
+                response=response_text,
+                tokens=tokens,
+                model=model
+            )
+            trace_logger.log_custom(
+                'llm_stream_complete',
+                agent=self.agent_name,
+                model=model,
+                latency_ms=round((time.perf_counter() - start_time) * 1000, 1)
             )
+            token_meter.record(self.agent_name, model, tokens)
             
             # Log tool calls if any
             if tool_calls:
@@ -115,7 +190,7 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
         else:
             # Non-streaming mode with temperature and seed
             response = self.client.chat.completions.create(
-                model=self.model_name,
+                model=model,
                 messages=conversation,
                 tools=self.get_tool_definitions(),
                 tool_choice=self.tool_choice if self.tool_registry else None,
@@ -144,14 +219,17 @@ class ReproducibleOpenAIAgent(OpenAIAgent):
                     'total': response.usage.total_tokens
                 }
             
+            self.last_usage = tokens
             system_fingerprint = getattr(response, 'system_fingerprint', None)
             
             trace_logger.log_llm_response(
                 agent_name=self.agent_name,
                 response=message.content or "",
                 tokens=tokens,
-                system_fingerprint=system_fingerprint
+                system_fingerprint=system_fingerprint,
+                model=model
             )
+            token_meter.record(self.agent_name, model, tokens)
             
             # Log tool calls if any
             if message.tool_calls:
@@ -3,32 +3,234 @@ SummarizerAgent: Uses OpenAIAgent to summarize text.
 Stub for assignment structure.
 """
 
+import json
+import os
+import time
+import uuid
+
+from src import config
+from src.agents.batch_backend import TERMINAL_STATES
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
 
 class SummarizerAgent:
-    def __init__(self, openai_agent):
+    def __init__(self, openai_agent, batch_backend=None, batch_dir=config.BATCH_DIR):
+        """
+        :param openai_agent: ReproducibleOpenAIAgent or AgentPool; its concurrency sets how many
+                             papers the orchestrator summarizes in parallel
+        :param batch_backend: Optional BatchBackend; if set, the orchestrator uses summarize_batch
+        :param batch_dir: Directory for batch job and result files
+        """
         self.openai_agent = openai_agent
+        self.batch_backend = batch_backend
+        self.batch_dir = batch_dir
+        self.concurrency = getattr(openai_agent, "concurrency", 1)
         self.trace_logger = get_trace_logger()
-        self.trace_logger.log_agent_init("SummarizerAgent")
+        self.token_meter = get_token_meter()
+        self.trace_logger.log_agent_init("SummarizerAgent", {
+            "model": openai_agent.model_name,
+            "concurrency": self.concurrency,
+            "batch_backend": batch_backend.name if batch_backend else None
+        })
+
+    def _build_prompt(self, text):
+        """Return (prompt, degraded); under budget pressure less text is sent to a cheaper model."""
+        degraded = self.token_meter.budget_level() != "normal"
+        max_chars = config.DEGRADED_SUMMARY_INPUT_CHARS if degraded else config.SUMMARY_INPUT_CHARS
+        prompt = (
+            "Summarize the following research paper text in a structured format: "
+            "- Main contributions\n- Methods\n- Key findings\n- Limitations\n- Citation (if available)\n"
+            "Text:\n" + (text[:max_chars] if text else "")  # Truncate for token safety
+        )
+        return prompt, degraded
+
+    def estimate_usage(self, text):
+        """
+        Estimated (model, prompt_tokens, completion_tokens) of summarizing text at the current
+        budget level, used to reserve budget before the call is submitted.
+        """
+        prompt, degraded = self._build_prompt(text)
+        model = config.BUDGET_FALLBACK_MODEL if degraded else self.openai_agent.model_name
+        return model, len(prompt) // config.CHARS_PER_TOKEN, config.SUMMARY_COMPLETION_TOKENS_ESTIMATE
 
     def summarize(self, text, metadata=None):
         """
         Summarize the given text using the OpenAIAgent.
         Returns a structured summary (dict or string).
         """
+        prompt, degraded = self._build_prompt(text)
         self.trace_logger.log_agent_action("SummarizerAgent", "summarize_start",
-                                          {"text_length": len(text), "metadata": metadata})
-        prompt = (
-            "Summarize the following research paper text in a structured format: "
-            "- Main contributions\n- Methods\n- Key findings\n- Limitations\n- Citation (if available)\n"
-            "Text:\n" + (text[:4000] if text else "")  # Truncate for token safety
-        )
+                                          {"text_length": len(text), "metadata": metadata,
+                                           "degraded": degraded})
         try:
-            summary = self.openai_agent.handle_message(prompt)
+            with self.token_meter.attribute("SummarizerAgent"), self.openai_agent.acquire() as agent:
+                agent.model_override = config.BUDGET_FALLBACK_MODEL if degraded else None
+                try:
+                    summary = agent.handle_message(prompt)
+                    tokens = agent.last_usage
+                finally:
+                    agent.model_override = None
             self.trace_logger.log_agent_action("SummarizerAgent", "summarize_complete",
                                               {"summary_length": len(summary), "metadata": metadata})
-            return {"summary": summary, "metadata": metadata}
+            return {"summary": summary, "metadata": metadata, "tokens": tokens}
         except Exception as e:
             print(f"Error summarizing text: {e}")
             self.trace_logger.log_error("SummarizerAgent", f"Error summarizing text: {str(e)}")
-            return {"summary": "", "metadata": metadata}
+            return {"summary": "", "metadata": metadata, "tokens": None}
+
+    def summarize_batch(self, parsed_texts):
+        """
+        Summarize many papers offline through self.batch_backend.
+        Each paper's usage is projected in rank order and reserved against the run budget;
+        papers that no longer fit are left out. Requests are serialized into JSONL job files
+        (at most config.BATCH_MAX_REQUESTS requests and config.BATCH_MAX_BYTES each),
+        submitted, polled until done, and mapped back to papers by custom_id.
+        Returns summaries in the same order as parsed_texts (empty summary on failure).
+        """
+        with self.openai_agent.acquire() as agent:
+            model, temperature, seed = agent.model_name, agent.temperature, agent.seed
+            system_prompt = getattr(agent, "system_prompt", None)
+        os.makedirs(self.batch_dir, exist_ok=True)
+        summaries = [{"summary": "", "metadata": p.get("metadata") or {"pdf_path": p["pdf_path"]}, "tokens": None}
+                     for p in parsed_texts]
+        job_id = uuid.uuid4().hex[:8]
+
+        reservations = []
+        try:
+            requests = []
+            for i, parsed in enumerate(parsed_texts):
+                # Reservations raise the budget level, so later papers degrade before they are dropped
+                prompt, degraded = self._build_prompt(parsed["text"])
+                request_model = config.BUDGET_FALLBACK_MODEL if degraded else model
+                estimate = (request_model, len(prompt) // config.CHARS_PER_TOKEN,
+                            config.SUMMARY_COMPLETION_TOKENS_ESTIMATE)
+                if not self.token_meter.fits(*estimate):
+                    print(f"Budget: skipping {len(parsed_texts) - i} lower-ranked papers in batch mode")
+                    self.trace_logger.log_decision("SummarizerAgent", "skip_batch_papers",
+                                                   reason="Projected usage exceeds the run budget",
+                                                   context={"skipped": [p["pdf_path"] for p in parsed_texts[i:]],
+                                                            "reserved": dict(self.token_meter.reserved)})
+                    break
+                reservations.append(self.token_meter.reserve(*estimate))
+                messages = [{"role": "user", "content": prompt}]
+                if system_prompt:
+                    messages.insert(0, {"role": "system", "content": system_prompt})
+                requests.append((json.dumps({
+                    "custom_id": f"paper-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": request_model,
+                        "messages": messages,
+                        "temperature": temperature,
+                        "seed": seed
+                    }
+                }) + "\n").encode("utf-8"))
+
+            # Submit every job file first so the backend can work on them concurrently
+            batches = []
+            for job_file, count in self._write_job_files(requests, job_id):
+                try:
+                    batch_id = self.batch_backend.submit(job_file)
+                except Exception as e:
+                    print(f"Error submitting batch {job_file}: {e}")
+                    self.trace_logger.log_error("SummarizerAgent", f"Error submitting batch {job_file}: {str(e)}",
+                                                error_type="BatchError")
+                    continue
+                batches.append((batch_id, job_file))
+                self.trace_logger.log_agent_action("SummarizerAgent", "batch_submitted", {
+                    "batch_id": batch_id, "job_file": job_file, "backend": self.batch_backend.name,
+                    "requests": count
+                })
+
+            for batch_id, job_file in batches:
+                try:
+                    status = self._wait_for_batch(batch_id)
+                    if status != "completed":
+                        print(f"Batch {batch_id} ended with status {status}")
+                        self.trace_logger.log_error("SummarizerAgent", f"Batch {batch_id} ended with status {status}",
+                                                    error_type="BatchError")
+                        continue
+                    job_stem, job_ext = os.path.splitext(job_file)
+                    results_file = self.batch_backend.fetch_results(batch_id, f"{job_stem}_results{job_ext}")
+                    self._map_batch_results(results_file, summaries)
+                except Exception as e:
+                    print(f"Error collecting batch {batch_id}: {e}")
+                    self.trace_logger.log_error("SummarizerAgent", f"Error collecting batch {batch_id}: {str(e)}",
+                                                error_type="BatchError")
+        finally:
+            for reservation in reservations:
+                self.token_meter.release(reservation)
+        return summaries
+
+    def _write_job_files(self, requests, job_id):
+        """
+        Write encoded request lines into job files within the Batch API's per-file request
+        and byte limits. Returns a list of (job_file, request_count).
+        """
+        jobs = []
+        handle = None
+        count = size = 0
+        for line in requests:
+            if handle is None or count >= config.BATCH_MAX_REQUESTS or size + len(line) > config.BATCH_MAX_BYTES:
+                if handle is not None:
+                    handle.close()
+                    jobs.append((handle.name, count))
+                handle = open(os.path.join(self.batch_dir, f"summaries_{job_id}_{len(jobs):04d}.jsonl"), 'wb')
+                count = size = 0
+            handle.write(line)
+            count += 1
+            size += len(line)
+        if handle is not None:
+            handle.close()
+            jobs.append((handle.name, count))
+        return jobs
+
+    def _wait_for_batch(self, batch_id):
+        """Poll a batch until it reaches a terminal state or config.BATCH_TIMEOUT elapses."""
+        deadline = time.monotonic() + config.BATCH_TIMEOUT
+        status = None
+        while True:
+            previous, status = status, self.batch_backend.poll(batch_id)
+            if status != previous:
+                self.trace_logger.log_agent_action("SummarizerAgent", "batch_status",
+                                                  {"batch_id": batch_id, "status": status})
+            if status in TERMINAL_STATES:
+                return status
+            if time.monotonic() >= deadline:
+                return "timeout"
+            time.sleep(config.BATCH_POLL_INTERVAL)
+
+    def _map_batch_results(self, results_file, summaries):
+        """Stream a results file and fill in summaries by custom_id."""
+        agent_name = f"{config.AGENT_NAME}_batch"
+        completed = failed = 0
+        with open(results_file) as f, self.token_meter.attribute("SummarizerAgent"):
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                index = int(result["custom_id"].split("-", 1)[1])
+                response = result.get("response") or {}
+                body = response.get("body") or {}
+                if result.get("error") or response.get("status_code") != 200 or not body.get("choices"):
+                    failed += 1
+                    self.trace_logger.log_error("SummarizerAgent", f"Batch request {result['custom_id']} failed: "
+                                                f"{result.get('error') or body.get('error')}", error_type="BatchError")
+                    continue
+                summary = body["choices"][0]["message"].get("content") or ""
+                usage = body.get("usage") or {}
+                tokens = {
+                    "prompt": usage.get("prompt_tokens", 0),
+                    "completion": usage.get("completion_tokens", 0),
+                    "total": usage.get("total_tokens", 0)
+                }
+                self.trace_logger.log_llm_response(agent_name, summary, tokens=tokens,
+                                                   system_fingerprint=body.get("system_fingerprint"),
+                                                   model=body.get("model"))
+                self.token_meter.record(agent_name, body.get("model", "unknown"), tokens)
+                summaries[index]["summary"] = summary
+                summaries[index]["tokens"] = tokens
+                completed += 1
+        self.trace_logger.log_agent_action("SummarizerAgent", "batch_results_mapped",
+                                          {"results_file": results_file, "completed": completed, "failed": failed})
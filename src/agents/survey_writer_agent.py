@@ -3,32 +3,47 @@ SurveyWriterAgent: Uses OpenAIAgent to generate the final mini-survey with citat
 Stub for assignment structure.
 """
 
+from src.memory.corpus_index import CorpusIndex
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
 
 class SurveyWriterAgent:
     def __init__(self, openai_agent):
         self.openai_agent = openai_agent
         self.trace_logger = get_trace_logger()
+        self.token_meter = get_token_meter()
         self.trace_logger.log_agent_init("SurveyWriterAgent")
 
-    def write_survey(self, synthesis, summaries):
+    def write_survey(self, synthesis, summaries, stream_to=None):
         """
         Generate a concise mini-survey (≤800 words) with inline citations using OpenAIAgent.
+        If stream_to is given, each response token is passed to it as it arrives.
         Returns the survey as a string.
         """
         self.trace_logger.log_agent_action("SurveyWriterAgent", "write_survey_start",
-                                          {"num_summaries": len(summaries)})
+                                          {"num_summaries": len(summaries),
+                                           "num_related": len(synthesis.get('related_work') or [])})
         # Prepare context for the prompt
         joined_summaries = "\n\n".join(f"Paper {i+1}: {s['summary']}" for i, s in enumerate(summaries) if s.get('summary'))
+        related_work = synthesis.get('related_work') or []
+        joined_related = "\n\n".join(f"Prior {i+1} ({CorpusIndex.citation(r)}): {r['text']}"
+                                     for i, r in enumerate(related_work))
         prompt = (
             "Write a concise mini-survey (≤800 words) on the following topic, synthesizing the provided insights and summaries. "
             "Include inline citations in the form [Paper 1], [Paper 2], etc.\n\n"
             f"Synthesis:\n{synthesis.get('synthesis', '')}\n\n"
             f"Summaries:\n{joined_summaries}\n\n"
-            "The survey should be clear, well-structured, and highlight key trends, gaps, and future directions."
         )
+        if joined_related:
+            prompt += (
+                "Related prior work from earlier runs may be cited as [Prior 1], [Prior 2], etc.:\n"
+                f"{joined_related}\n\n"
+            )
+        prompt += "The survey should be clear, well-structured, and highlight key trends, gaps, and future directions."
         try:
-            survey = self.openai_agent.handle_message(prompt)
+            with self.token_meter.attribute("SurveyWriterAgent"), self.openai_agent.acquire() as agent, \
+                    agent.stream_to(stream_to):
+                survey = agent.handle_message(prompt)
             self.trace_logger.log_agent_action("SurveyWriterAgent", "write_survey_complete",
                                               {"survey_length": len(survey), "word_count": len(survey.split())})
             return survey
@@ -3,33 +3,71 @@ SynthesizerAgent: Uses OpenAIAgent to synthesize insights and gaps across summar
 Stub for assignment structure.
 """
 
+from src import config
+from src.memory.corpus_index import CorpusIndex
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
 
 class SynthesizerAgent:
-    def __init__(self, openai_agent):
+    def __init__(self, openai_agent, corpus_index=None, related_k=config.CORPUS_RELATED_K):
         self.openai_agent = openai_agent
+        self.corpus_index = corpus_index
+        self.related_k = related_k
         self.trace_logger = get_trace_logger()
-        self.trace_logger.log_agent_init("SynthesizerAgent")
+        self.token_meter = get_token_meter()
+        self.trace_logger.log_agent_init("SynthesizerAgent", {"corpus_index": corpus_index is not None})
 
-    def synthesize(self, summaries):
+    def find_related_work(self, summaries):
+        """
+        Query the cross-run corpus index for prior papers related to the current summaries.
+        Papers from the current run (matched by paper_id) are excluded.
+        Returns a list of index records, best first.
+        """
+        if self.corpus_index is None or not len(self.corpus_index):
+            return []
+        texts = [s['summary'] for s in summaries if s.get('summary')]
+        current_ids = {(s.get('metadata') or {}).get('paper_id') or self.corpus_index.make_id(s['summary'])
+                       for s in summaries if s.get('summary')}
+        best = {}
+        for text in texts:
+            for hit in self.corpus_index.query(text, k=self.related_k, exclude_ids=current_ids):
+                if hit['id'] not in best or hit['score'] > best[hit['id']]['score']:
+                    best[hit['id']] = hit
+        related = sorted(best.values(), key=lambda h: h['score'], reverse=True)[:self.related_k]
+        self.trace_logger.log_agent_action("SynthesizerAgent", "related_work_found",
+                                          {"count": len(related), "ids": [h['id'] for h in related]})
+        return related
+
+    def synthesize(self, summaries, stream_to=None):
         """
         Synthesize cross-paper insights and gaps from a list of summaries using OpenAIAgent.
+        If stream_to is given, each response token is passed to it as it arrives.
         Returns a synthesis result (dict or string).
         """
         self.trace_logger.log_agent_action("SynthesizerAgent", "synthesize_start",
                                           {"num_summaries": len(summaries)})
         joined_summaries = "\n\n".join(s['summary'] for s in summaries if s.get('summary'))
+        related_work = self.find_related_work(summaries)
         prompt = (
             "Given the following research paper summaries, synthesize the main cross-paper insights and identify key research gaps. "
             "Present insights and gaps in a structured format.\n\n"
             f"Summaries:\n{joined_summaries}"
         )
+        if related_work:
+            joined_related = "\n\n".join(f"Prior {i+1} ({CorpusIndex.citation(r)}): {r['text']}"
+                                         for i, r in enumerate(related_work))
+            prompt += (
+                "\n\nRelated prior work from earlier runs (use it to situate the current papers):\n"
+                f"{joined_related}"
+            )
         try:
-            synthesis = self.openai_agent.handle_message(prompt)
+            with self.token_meter.attribute("SynthesizerAgent"), self.openai_agent.acquire() as agent, \
+                    agent.stream_to(stream_to):
+                synthesis = agent.handle_message(prompt)
             self.trace_logger.log_agent_action("SynthesizerAgent", "synthesize_complete",
                                               {"synthesis_length": len(synthesis)})
-            return {"synthesis": synthesis}
+            return {"synthesis": synthesis, "related_work": related_work}
         except Exception as e:
             print(f"Error synthesizing summaries: {e}")
             self.trace_logger.log_error("SynthesizerAgent", f"Error synthesizing summaries: {str(e)}")
-            return {"synthesis": ""}
+            return {"synthesis": "", "related_work": related_work}
@@ -9,18 +9,99 @@ DEFAULT_TEMPERATURE = 0.0  # Set to 0 for deterministic output
 DEFAULT_SEED = 42  # Fixed seed for reproducibility
 DEFAULT_MAX_TOKENS = 4096
 
+# Per-Agent Model Routing: cheap/fast model for per-paper summaries, large model for synthesis and survey
+AGENT_MODELS = {
+    "summarizer": "gpt-4o-mini",
+    "synthesizer": DEFAULT_MODEL,
+    "survey_writer": DEFAULT_MODEL,
+}
+# Clients per role (each with its own connection pool); bounds concurrent LLM calls for that role
+AGENT_CONCURRENCY = {
+    "summarizer": 8,
+    "synthesizer": 1,
+    "survey_writer": 1,
+}
+
 # Agent Configuration
 AGENT_NAME = "openai_agent"
 AGENT_TYPE = "ChatAgent"
 IS_STREAMING = False
+STREAM_OUTPUT = False  # Stream synthesis/survey tokens to stdout and output files (--stream)
 
 # Output Configuration
 DEFAULT_OUTPUT_FILE = "outputs/mini_survey.txt"
 DEFAULT_DOWNLOAD_DIR = "pdfs_downloaded"
 
+# PDF Mining / Prefetch Configuration
+DEFAULT_MAX_PAPERS = 6
+ARXIV_PAGE_SIZE = 50  # Results per arXiv API page; the next page is fetched while the current one downloads
+ARXIV_PAGE_DELAY = 3  # Seconds between arXiv API page requests
+HTTP_TIMEOUT = 60  # Seconds
+PREFETCH_WORKERS = 4  # Concurrent PDF downloads
+PREFETCH_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024  # Bound on bytes being downloaded at once
+PREFETCH_PDF_SIZE_ESTIMATE = 2 * 1024 * 1024  # Reserved per queued download until its Content-Length is known
+
 # Logging Configuration
 LOG_FILE = "logs/research_copilot.log"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 # Observability Configuration
 TRACE_FILE = "logs/trace.jsonl"  # Structured trace file for observability
+
+# Corpus Index Configuration (cross-run vector index of summaries)
+CORPUS_INDEX_DIR = "corpus_index"
+CORPUS_INDEX_DIM = 256  # Embedding dimension of the hashing embedder
+CORPUS_INDEX_SNIPPET_CHARS = 1500  # Summary characters kept in the metadata sidecar
+CORPUS_INDEX_NPROBE = 8  # IVF lists scanned per query
+CORPUS_INDEX_IVF_THRESHOLD = 50000  # Build the IVF layer once the index holds this many papers
+CORPUS_RELATED_K = 5  # Related prior papers pulled into synthesis
+
+# Run Memory Configuration (bounded EphemeralMemory backend)
+RUN_MEMORY_DIR = "logs/run_memory"  # Spilled per-paper artifacts and batched message log (one subdirectory per run)
+RUN_MEMORY_MAX_RESIDENT_PAPERS = 256  # Papers kept in memory before spilling to disk
+RUN_MEMORY_MAX_THREAD_MESSAGES = 100  # Recent messages kept in memory per thread
+RUN_MEMORY_BATCH_SIZE = 64  # Lines buffered before each file write
+
+# Token/Cost Budget Configuration (per run; None = unlimited)
+TOKEN_BUDGET = None  # Max total LLM tokens per run
+COST_BUDGET = None  # Max estimated USD per run (see MODEL_PRICING)
+BUDGET_DEGRADE_AT = 0.6  # Fraction of budget at which summaries use shorter input and BUDGET_FALLBACK_MODEL
+BUDGET_CRITICAL_AT = 0.85  # Fraction at which remaining (lower-ranked) papers are skipped
+BUDGET_FALLBACK_MODEL = "gpt-4.1-nano"  # Must be cheaper than AGENT_MODELS["summarizer"] to save anything
+SUMMARY_COMPLETION_TOKENS_ESTIMATE = 600  # Expected summary length, reserved against the budget at submit time
+CHARS_PER_TOKEN = 4  # Rough prompt-size estimate used for budget reservations
+SUMMARY_INPUT_CHARS = 4000  # Paper text sent to the summarizer
+DEGRADED_SUMMARY_INPUT_CHARS = 2000  # Paper text sent once the budget is degraded
+
+# LLM Pricing (USD per 1M tokens: prompt, completion) used for cost estimates
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Trace Rotation and Sampling Configuration
+TRACE_MAX_BYTES = 64 * 1024 * 1024  # Roll the active trace file over at this size (0 disables rotation)
+TRACE_COMPRESSION = "gzip"  # Compression of rolled segments: "gzip", "zstd" (needs zstandard) or None
+TRACE_BUFFER_BYTES = 256 * 1024  # Write buffer; errors and workflow events are flushed immediately
+TRACE_VERBOSITY = "full"
+# Sampling applies to high-volume event types only; errors and LLM usage are always kept
+TRACE_VERBOSITY_PRESETS = {
+    "full": {"sample_rates": {}, "preview_chars": 200},
+    "sampled": {"sample_rates": {"memory_operation": 0.1, "agent_action": 0.25}, "preview_chars": 200},
+    "minimal": {"sample_rates": {"memory_operation": 0.0, "agent_action": 0.0}, "preview_chars": 0},
+}
+
+# Batch Summarization Configuration (offline jobs via --batch)
+BATCH_BACKEND = None  # "openai" (Batch API) or "local" (file-based stand-in); None = interactive calls
+BATCH_DIR = "batch_jobs"  # Job and result JSONL files
+BATCH_MAX_REQUESTS = 50000  # Requests per job file (Batch API limit)
+BATCH_MAX_BYTES = 190 * 1024 * 1024  # Bytes per job file (Batch API input limit is 200 MB)
+BATCH_POLL_INTERVAL = 60  # Seconds between status polls
+BATCH_TIMEOUT = 26 * 3600  # Give up polling after this many seconds (24h completion window + margin)
+
+# Profiling Configuration (--profile)
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between call-stack samples for the flamegraph (0 disables sampling)
+PROFILE_TOP_N = 15  # Hottest functions per stage/agent recorded in the trace
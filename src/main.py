@@ -14,14 +14,18 @@ from src.agents import (
     SummarizerAgent,
     SynthesizerAgent,
     SurveyWriterAgent,
-    ReproducibleOpenAIAgent
+    ModelRouter
 )
+from src.agents.batch_backend import create_batch_backend
 from src.orchestrator import ResearchCopilotOrchestrator
+from src.memory.corpus_index import CorpusIndex
+from src.memory.ephemeral_memory_setup import configure_run_memory
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
+from src.utils.stream_sink import StreamSink, partial_path
+from src.utils.profiler import RunProfiler
 from src import config
 
-from moya.agents.openai_agent import OpenAIAgentConfig
-
 logging.basicConfig(
     level=logging.INFO,
     format=config.LOG_FORMAT,
@@ -40,7 +44,29 @@ def main():
     parser.add_argument('--openai-api-key', type=str, default=None, help='OpenAI API key (or set OPENAI_API_KEY env var)')
     parser.add_argument('--temperature', type=float, default=config.DEFAULT_TEMPERATURE, help='LLM temperature for reproducibility (default: 0.0)')
     parser.add_argument('--seed', type=int, default=config.DEFAULT_SEED, help='Random seed for reproducibility (default: 42)')
-    parser.add_argument('--model', type=str, default=config.DEFAULT_MODEL, help='OpenAI model to use (default: gpt-4o)')
+    parser.add_argument('--model', type=str, default=config.DEFAULT_MODEL,
+                        help='OpenAI model for synthesis and survey writing (default: gpt-4o)')
+    parser.add_argument('--summarizer-model', type=str, default=config.AGENT_MODELS["summarizer"],
+                        help=f'OpenAI model for per-paper summaries (default: {config.AGENT_MODELS["summarizer"]})')
+    parser.add_argument('--summarizer-concurrency', type=int, default=config.AGENT_CONCURRENCY["summarizer"],
+                        help=f'Concurrent summarization calls (default: {config.AGENT_CONCURRENCY["summarizer"]})')
+    parser.add_argument('--corpus-index', type=str, nargs='?', const=config.CORPUS_INDEX_DIR, default=None,
+                        help=f'Enable the cross-run corpus index of summaries (default dir: {config.CORPUS_INDEX_DIR})')
+    parser.add_argument('--trace-verbosity', type=str, default=config.TRACE_VERBOSITY,
+                        choices=sorted(config.TRACE_VERBOSITY_PRESETS),
+                        help=f'Trace sampling/verbosity preset (default: {config.TRACE_VERBOSITY})')
+    parser.add_argument('--token-budget', type=int, default=config.TOKEN_BUDGET,
+                        help='Max LLM tokens for the run; summaries degrade as it is approached (default: unlimited)')
+    parser.add_argument('--cost-budget', type=float, default=config.COST_BUDGET,
+                        help='Max estimated USD for the run, priced from config.MODEL_PRICING (default: unlimited)')
+    parser.add_argument('--stream', action='store_true', default=config.STREAM_OUTPUT,
+                        help='Stream the synthesis and survey to stdout and their output files as tokens arrive')
+    parser.add_argument('--batch', type=str, choices=['openai', 'local'], default=config.BATCH_BACKEND,
+                        help='Summarize papers in offline batch jobs: "openai" (Batch API) or "local" (file-based stand-in)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile each stage and agent; pstats and flamegraph stacks go to <output>_profile/')
+    parser.add_argument('--max-papers', type=int, default=config.DEFAULT_MAX_PAPERS,
+                        help=f'Number of arXiv papers to download for --topic (default: {config.DEFAULT_MAX_PAPERS})')
     args = parser.parse_args()
 
     api_key = args.openai_api_key or os.getenv("OPENAI_API_KEY")
@@ -48,61 +74,116 @@ def main():
         logger.error("OpenAI API key required. Use --openai-api-key or set OPENAI_API_KEY env var.")
         sys.exit(1)
     
+    output_stem, output_ext = os.path.splitext(args.output)
+    started = datetime.now()
+    run_id = f"{started.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
     run_config = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": started.isoformat(),
+        "run_id": run_id,
         "model": args.model,
         "temperature": args.temperature,
         "seed": args.seed,
         "topic": args.topic,
         "pdf_folder": args.pdf_folder,
-        "output_file": args.output
+        "output_file": args.output,
+        "corpus_index": args.corpus_index,
+        "trace_verbosity": args.trace_verbosity,
+        "token_budget": args.token_budget,
+        "cost_budget": args.cost_budget,
+        "stream": args.stream,
+        "batch": args.batch,
+        "profile": args.profile,
+        "max_papers": args.max_papers
     }
+    synthesis_output = f"{output_stem}_synthesis{output_ext}"
+    if args.stream:
+        # Streams are written to .part files until the run succeeds; record them so consumers can tail them
+        run_config["stream_files"] = {"survey": partial_path(args.output),
+                                      "synthesis": partial_path(synthesis_output)}
     logger.info("=== Research Co-Pilot Run Configuration ===")
     logger.info(f"Configuration: {json.dumps(run_config, indent=2)}")
     
-    trace_logger = get_trace_logger(config.TRACE_FILE)
+    trace_logger = get_trace_logger(config.TRACE_FILE, run_id=run_id, verbosity=args.trace_verbosity)
+    run_config["trace_file"] = str(trace_logger.trace_file)
     trace_logger.log_workflow_start(run_config)
+    token_meter = get_token_meter(max_tokens=args.token_budget, max_cost=args.cost_budget)
     
-    openai_agent = ReproducibleOpenAIAgent(
-        config=OpenAIAgentConfig(
-            agent_name=config.AGENT_NAME,
-            description="LLM agent for summarization, synthesis, and survey writing",
-            api_key=api_key,
-            model_name=args.model,
-            agent_type=config.AGENT_TYPE,
-            is_streaming=config.IS_STREAMING
-        ),
+    router = ModelRouter(
+        api_key,
+        models={"summarizer": args.summarizer_model, "synthesizer": args.model, "survey_writer": args.model},
+        concurrency={"summarizer": args.summarizer_concurrency},
         temperature=args.temperature,
         seed=args.seed
     )
+    run_config["models"] = router.describe()
+
+    configure_run_memory(config.RUN_MEMORY_DIR, run_id=run_id)
 
     logger.info("Initializing agents...")
     pdf_miner = PDFMinerAgent(args.topic, download_dir=config.DEFAULT_DOWNLOAD_DIR)
     pdf_parser = PDFParserAgent()
-    summarizer = SummarizerAgent(openai_agent)
-    synthesizer = SynthesizerAgent(openai_agent)
-    survey_writer = SurveyWriterAgent(openai_agent)
+    batch_backend = create_batch_backend(args.batch, config.BATCH_DIR, api_key=api_key) if args.batch else None
+    summarizer = SummarizerAgent(router.pool("summarizer"), batch_backend=batch_backend)
+    corpus_index = CorpusIndex(args.corpus_index) if args.corpus_index else None
+    synthesizer = SynthesizerAgent(router.pool("synthesizer"), corpus_index=corpus_index)
+    survey_writer = SurveyWriterAgent(router.pool("survey_writer"))
+
+    profiler = None
+    if args.profile:
+        profiler = RunProfiler(f"{output_stem}_profile")
+        run_config["profile_dir"] = profiler.output_dir
+        profiler.start()
 
     orchestrator = ResearchCopilotOrchestrator(
-        pdf_miner, pdf_parser, summarizer, synthesizer, survey_writer
+        pdf_miner, pdf_parser, summarizer, synthesizer, survey_writer, corpus_index=corpus_index,
+        profiler=profiler
     )
 
     logger.info("Starting research workflow...")
-    survey = orchestrator.run(topic=args.topic, pdf_folder=args.pdf_folder)
-    if survey:
-        with open(args.output, 'w') as f:
-            f.write(survey)
-        logger.info(f"Mini-survey written to {args.output}")
-        
-        config_output = args.output.replace('.txt', '_config.json')
+    survey = None
+    success = False
+    try:
+        if args.stream:
+            # Survey tokens stream to the output file, the synthesis to a sidecar; both replace
+            # the previous files only if the run produces a survey
+            with StreamSink(synthesis_output) as synthesis_sink, StreamSink(args.output) as survey_sink:
+                survey = orchestrator.run(topic=args.topic, pdf_folder=args.pdf_folder, max_papers=args.max_papers,
+                                          synthesis_stream=synthesis_sink.write, survey_stream=survey_sink.write)
+                if survey:
+                    synthesis_sink.commit()
+                    survey_sink.commit()
+                    logger.info(f"Synthesis streamed to {synthesis_output}")
+        else:
+            survey = orchestrator.run(topic=args.topic, pdf_folder=args.pdf_folder, max_papers=args.max_papers)
+            if survey:
+                with open(args.output, 'w') as f:
+                    f.write(survey)
+        success = bool(survey)
+    except Exception as e:
+        run_config["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Profile and record failed runs too; that is often when the profile and usage are needed most
+        if profiler:
+            profile_files = profiler.finish()
+            logger.info(f"Profile written to {profiler.output_dir} ({len(profile_files)} files)")
+        run_config["token_usage"] = token_meter.snapshot()
+        trace_logger.log_custom("token_usage", **run_config["token_usage"])
+        logger.info(f"Token usage: {json.dumps(run_config['token_usage']['run'])}")
+        run_config["success"] = success
+
+        config_output = f"{output_stem}_config.json"
         with open(config_output, 'w') as f:
             json.dump(run_config, f, indent=2)
         logger.info(f"Run configuration saved to {config_output}")
-        
-        trace_logger.log_workflow_complete(args.output, success=True)
-    else:
-        logger.warning("No survey generated.")
-        trace_logger.log_workflow_complete("", success=False)
+
+        if success:
+            logger.info(f"Mini-survey written to {args.output}")
+            trace_logger.log_workflow_complete(args.output, success=True)
+        else:
+            logger.warning("No survey generated.")
+            trace_logger.log_workflow_complete("", success=False)
+        trace_logger.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,338 @@
+"""
+CorpusIndex: persistent, memory-mapped vector index of paper summaries across runs.
+
+Vectors live in a flat float32 file (``vectors.f32``) that is memory-mapped for
+queries, with one metadata line per row in ``metadata.jsonl``. An optional
+IVF (inverted file) layer clusters rows so queries only scan the closest lists.
+Rows are keyed by a stable paper id (e.g. ``arxiv:<id>``), and writes take an
+exclusive file lock so concurrent runs can share one index.
+"""
+
+import json
+import hashlib
+import math
+import os
+import re
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+from src import config
+from src.utils.trace_logger import get_trace_logger
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder (unigrams + bigrams).
+    Needs no API calls, so the same text always maps to the same vector across runs.
+    """
+
+    def __init__(self, dim=config.CORPUS_INDEX_DIM):
+        self.dim = dim
+
+    def embed(self, text):
+        """
+        Embed text into an L2-normalized float32 vector of length dim.
+        """
+        vec = np.zeros(self.dim, dtype=np.float32)
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        counts = {}
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            vec[h % self.dim] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+
+class CorpusIndex:
+    """
+    Append-only vector index of summaries that persists between runs.
+    Supports incremental inserts and top-K cosine similarity queries.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    METADATA_FILE = "metadata.jsonl"
+    IVF_FILE = "ivf.npz"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, index_dir=config.CORPUS_INDEX_DIR, dim=config.CORPUS_INDEX_DIM, embedder=None):
+        """
+        Open (or create) the index stored in index_dir.
+
+        :param index_dir: Directory holding the vector, metadata and IVF files
+        :param dim: Embedding dimension (must match an existing index)
+        :param embedder: Object with an ``embed(text)`` method; defaults to HashingEmbedder
+        """
+        self.index_dir = index_dir
+        self.dim = dim
+        self.embedder = embedder or HashingEmbedder(dim)
+        os.makedirs(index_dir, exist_ok=True)
+        self.vectors_path = os.path.join(index_dir, self.VECTORS_FILE)
+        self.metadata_path = os.path.join(index_dir, self.METADATA_FILE)
+        self.ivf_path = os.path.join(index_dir, self.IVF_FILE)
+        self.lock_path = os.path.join(index_dir, self.LOCK_FILE)
+        self._matrix = None
+        self._ivf = None
+        with self._locked():
+            self._load()
+        self.trace_logger = get_trace_logger()
+        self.trace_logger.log_agent_init("CorpusIndex", {
+            "index_dir": index_dir, "dim": dim, "size": len(self), "ivf": self._ivf is not None
+        })
+
+    @staticmethod
+    def make_id(text):
+        """Fallback document id derived from the text, for documents without a paper id."""
+        return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def citation(record):
+        """
+        Human-readable reference for an index record built from its metadata
+        (title, authors, arXiv id), falling back to the PDF file name.
+        """
+        metadata = record.get("metadata") or {}
+        authors = metadata.get("authors") or []
+        parts = [metadata.get("title") or os.path.basename(metadata.get("pdf_path") or "") or record["id"]]
+        if authors:
+            parts.append(", ".join(authors[:3]) + (" et al." if len(authors) > 3 else ""))
+        if metadata.get("published"):
+            parts.append(str(metadata["published"])[:4])
+        if metadata.get("arxiv_id"):
+            parts.append(f"arXiv:{metadata['arxiv_id']}")
+        return ". ".join(part.rstrip(".") for part in parts)
+
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive lock on the index directory (no-op where fcntl is unavailable)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._ids
+
+    def _load(self):
+        """Scan the metadata sidecar for ids and byte offsets, repairing torn writes."""
+        self._ids = {}
+        self._offsets = []
+        end = 0
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    self._ids[record["id"]] = len(self._offsets)
+                    self._offsets.append(end)
+                    end += len(line)
+        row_bytes = self.dim * 4
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        count = min(vectors_size // row_bytes, len(self._offsets))
+        # Trim both files to the rows they agree on (e.g. after an interrupted insert)
+        if vectors_size != count * row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * row_bytes)
+        if count < len(self._offsets):
+            end = self._offsets[count]
+            self._offsets = self._offsets[:count]
+            self._ids = {doc_id: row for doc_id, row in self._ids.items() if row < count}
+        if os.path.exists(self.metadata_path) and os.path.getsize(self.metadata_path) != end:
+            with open(self.metadata_path, "r+b") as f:
+                f.truncate(end)
+        self._metadata_end = end
+        if os.path.exists(self.ivf_path):
+            ivf = np.load(self.ivf_path)
+            if ivf["centroids"].shape[1] == self.dim and int(ivf["count"]) <= count:
+                self._ivf = {key: ivf[key] for key in ("centroids", "assignments", "count")}
+
+    def _sync(self):
+        """Pick up rows appended by other processes since the index was loaded (lock held)."""
+        if not os.path.exists(self.metadata_path) or os.path.getsize(self.metadata_path) == self._metadata_end:
+            return
+        with open(self.metadata_path, "rb") as f:
+            f.seek(self._metadata_end)
+            for line in f:
+                record = json.loads(line)
+                self._ids[record["id"]] = len(self._offsets)
+                self._offsets.append(self._metadata_end)
+                self._metadata_end += len(line)
+
+    def _vectors(self):
+        """Return the memory-mapped (n, dim) vector matrix."""
+        if self._matrix is None or self._matrix.shape[0] != len(self):
+            if len(self) == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self), self.dim))
+        return self._matrix
+
+    def _read_metadata(self, row):
+        with open(self.metadata_path, "rb") as f:
+            f.seek(self._offsets[row])
+            return json.loads(f.readline())
+
+    def add(self, text, metadata=None, doc_id=None):
+        """
+        Insert a single document. Returns False if it was already indexed.
+        """
+        return self.add_many([(text, metadata, doc_id)]) == 1
+
+    def add_many(self, items):
+        """
+        Insert documents in one batch.
+
+        :param items: Iterable of (text, metadata, doc_id) tuples; doc_id should be a stable
+            paper id (e.g. ``arxiv:<id>``) and falls back to a hash of the text when None
+        :return: Number of newly inserted documents
+        """
+        items = [(text, metadata, doc_id or self.make_id(text)) for text, metadata, doc_id in items]
+        with self._locked():
+            self._sync()
+            vectors = []
+            lines = []
+            new_ids = []
+            seen = set()
+            for text, metadata, doc_id in items:
+                if doc_id in self._ids or doc_id in seen:
+                    continue
+                vectors.append(self.embedder.embed(text))
+                record = {
+                    "id": doc_id,
+                    "text": (text or "")[:config.CORPUS_INDEX_SNIPPET_CHARS],
+                    "metadata": metadata or {}
+                }
+                lines.append((json.dumps(record, default=str) + "\n").encode("utf-8"))
+                new_ids.append(doc_id)
+                seen.add(doc_id)
+            if not vectors:
+                return 0
+            # Vectors first: a crash between the two writes leaves an orphan vector, which _load trims
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(vectors).astype(np.float32).tobytes())
+            with open(self.metadata_path, "ab") as f:
+                for doc_id, line in zip(new_ids, lines):
+                    f.write(line)
+                    self._ids[doc_id] = len(self._offsets)
+                    self._offsets.append(self._metadata_end)
+                    self._metadata_end += len(line)
+        self.trace_logger.log_agent_action("CorpusIndex", "insert", {"added": len(new_ids), "size": len(self)})
+        return len(new_ids)
+
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=20000):
+        """
+        Cluster the indexed vectors with spherical k-means and persist an IVF layer.
+        Rows inserted after the build are still searched (brute-force) until the next build.
+
+        :param n_lists: Number of inverted lists (default: ~sqrt(n))
+        :param iterations: k-means iterations
+        :param sample_size: Number of rows used to train the centroids
+        """
+        with self._locked():
+            self._sync()
+            n = len(self)
+            if n == 0:
+                return
+            n_lists = n_lists or max(1, int(math.sqrt(n)))
+            vectors = self._vectors()
+            rng = np.random.default_rng(config.DEFAULT_SEED)
+            sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))])
+            centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroid = members.sum(axis=0)
+                        centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+            assignments = np.empty(n, dtype=np.int32)
+            for start in range(0, n, 65536):
+                block = np.asarray(vectors[start:start + 65536])
+                assignments[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+            self._ivf = {"centroids": centroids, "assignments": assignments, "count": np.int64(n)}
+            # Write-then-rename so readers never load a partial IVF file
+            np.savez(self.ivf_path + ".tmp.npz", **self._ivf)
+            os.replace(self.ivf_path + ".tmp.npz", self.ivf_path)
+        self.trace_logger.log_agent_action("CorpusIndex", "build_ivf", {"n_lists": len(centroids), "size": n})
+
+    def maybe_rebuild_ivf(self, threshold=config.CORPUS_INDEX_IVF_THRESHOLD):
+        """
+        Build or refresh the IVF layer once the index is large enough and the
+        unclustered tail has grown past the clustered part.
+        """
+        n = len(self)
+        if n < threshold:
+            return False
+        if self._ivf is not None and n - int(self._ivf["count"]) < int(self._ivf["count"]):
+            return False
+        self.build_ivf()
+        return True
+
+    def query(self, text, k=5, exclude_ids=None, n_probe=config.CORPUS_INDEX_NPROBE):
+        """
+        Return the top-K most similar indexed documents.
+
+        :param text: Query text
+        :param k: Number of results
+        :param exclude_ids: Document ids to leave out (e.g. papers from the current run)
+        :param n_probe: Number of IVF lists to scan when an IVF layer exists
+        :return: List of dicts with id, score, text and metadata, best first
+        """
+        start_time = time.perf_counter()
+        exclude_ids = set(exclude_ids or ())
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        vectors = self._vectors()
+        q = self.embedder.embed(text)
+        if self._ivf is not None:
+            indexed = int(self._ivf["count"])
+            probe = np.argsort(-(self._ivf["centroids"] @ q))[:n_probe]
+            candidates = np.flatnonzero(np.isin(self._ivf["assignments"], probe))
+            candidates = np.concatenate([candidates, np.arange(indexed, n)])
+            scores = np.asarray(vectors[candidates]) @ q
+        else:
+            candidates = None
+            scores = vectors @ q
+        # Over-fetch so excluded ids do not starve the result list
+        fetch = min(len(scores), k + len(exclude_ids))
+        top = np.argpartition(-scores, fetch - 1)[:fetch]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            row = int(candidates[i]) if candidates is not None else int(i)
+            record = self._read_metadata(row)
+            if record["id"] in exclude_ids:
+                continue
+            record["score"] = float(scores[i])
+            results.append(record)
+            if len(results) == k:
+                break
+        self.trace_logger.log_agent_action("CorpusIndex", "query", {
+            "k": k, "results": len(results), "size": n,
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 3)
+        })
+        return results
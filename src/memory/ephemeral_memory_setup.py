@@ -5,10 +5,28 @@ Provides a shared memory interface for agents to store and retrieve context/resu
 
 from moya.tools.ephemeral_memory import EphemeralMemory
 
+from src import config
+from src.memory.run_memory import RunMemoryRepository
+
+
+def configure_run_memory(spill_dir=config.RUN_MEMORY_DIR, run_id=None, **kwargs):
+    """
+    Install a RunMemoryRepository behind EphemeralMemory and return it.
+    Existing EphemeralMemory.store_message calls then go to the bounded, indexed run memory,
+    spilled under spill_dir/<run_id>/ when run_id is given.
+    """
+    repository = RunMemoryRepository(spill_dir, run_id=run_id, **kwargs)
+    EphemeralMemory.memory_repository = repository
+    return repository
+
 # Example usage:
 # To store a message or result:
 # EphemeralMemory.store_message(thread_id, sender, content)
 #
+# To store a typed per-paper artifact (requires configure_run_memory()):
+# EphemeralMemory.store_message(thread_id, sender, content,
+#                               metadata={"paper_id": "arxiv:2101.00001", "kind": "summary", "artifact": {...}})
+#
 # To retrieve a thread summary:
 # summary = EphemeralMemory.get_thread_summary(thread_id)
 
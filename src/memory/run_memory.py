@@ -0,0 +1,201 @@
+"""
+RunMemoryRepository: bounded, indexed memory backend for research runs.
+
+Plugs in behind EphemeralMemory (as its ``memory_repository``) and keeps:
+- typed per-paper artifacts (parse stats, summary, tokens) indexed by (thread_id, paper_id),
+- only the most recently used papers resident, spilling the rest to a JSONL segment on disk,
+- a bounded tail of messages per thread, with the full message log written in batches.
+"""
+
+import json
+import os
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from moya.conversation.thread import Thread
+from moya.memory.base_repository import BaseMemoryRepository
+
+from src import config
+
+# Artifact kinds recorded per paper
+ARTIFACT_KINDS = ("parse", "summary", "tokens")
+
+
+class RunMemoryRepository(BaseMemoryRepository):
+    """
+    Memory repository with O(1) artifact lookup by (thread_id, paper_id),
+    bounded resident memory with spill-to-disk, and batched file writes.
+
+    Messages carrying ``metadata={"paper_id": ..., "kind": ..., "artifact": {...}}``
+    are recorded as artifacts; all messages go to the per-thread tail and message log.
+    """
+
+    SPILL_FILE = "artifacts.jsonl"
+    MESSAGE_LOG_FILE = "messages.jsonl"
+
+    def __init__(self, spill_dir=config.RUN_MEMORY_DIR, run_id=None,
+                 max_resident_papers=config.RUN_MEMORY_MAX_RESIDENT_PAPERS,
+                 max_thread_messages=config.RUN_MEMORY_MAX_THREAD_MESSAGES,
+                 batch_size=config.RUN_MEMORY_BATCH_SIZE):
+        """
+        :param spill_dir: Directory for spilled artifacts and the message log
+        :param run_id: If given, files go to spill_dir/<run_id>/ so concurrent runs do not clobber each other
+        :param max_resident_papers: Papers kept in memory before spilling the least recently used
+        :param max_thread_messages: Messages kept in memory per thread
+        :param batch_size: Number of pending lines buffered before a file write
+        """
+        self.spill_dir = os.path.join(spill_dir, run_id) if run_id else spill_dir
+        self.max_resident_papers = max_resident_papers
+        self.max_thread_messages = max_thread_messages
+        self.batch_size = batch_size
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.spill_path = os.path.join(self.spill_dir, self.SPILL_FILE)
+        self.message_log_path = os.path.join(self.spill_dir, self.MESSAGE_LOG_FILE)
+        # Start each run with empty files so offsets in the spill index stay valid
+        open(self.spill_path, 'w').close()
+        open(self.message_log_path, 'w').close()
+        self._spill_size = 0
+        self._threads = {}
+        self._message_counts = {}
+        self._resident = OrderedDict()
+        self._spilled = {}
+        self._pending_spill = []
+        self._pending_spill_bytes = 0
+        self._pending_messages = []
+
+    # --- BaseMemoryRepository interface -------------------------------------------------
+
+    def create_thread(self, thread):
+        self._threads.setdefault(thread.thread_id, deque(maxlen=self.max_thread_messages))
+        self._message_counts.setdefault(thread.thread_id, 0)
+
+    def get_thread(self, thread_id):
+        """Return a Thread holding the bounded in-memory tail of messages."""
+        if thread_id not in self._threads:
+            return None
+        thread = Thread(thread_id=thread_id)
+        for message in self._threads[thread_id]:
+            thread.add_message(message)
+        return thread
+
+    def delete_thread(self, thread_id):
+        self._threads.pop(thread_id, None)
+        self._message_counts.pop(thread_id, None)
+        for key in [k for k in self._resident if k[0] == thread_id]:
+            del self._resident[key]
+        for key in [k for k in self._spilled if k[0] == thread_id]:
+            del self._spilled[key]
+
+    def append_message(self, thread_id, message):
+        self.create_thread(Thread(thread_id=thread_id))
+        self._threads[thread_id].append(message)
+        self._message_counts[thread_id] += 1
+        metadata = getattr(message, 'metadata', None) or {}
+        self._pending_messages.append(json.dumps({
+            "thread_id": thread_id,
+            "sender": message.sender,
+            "content": message.content,
+            "paper_id": metadata.get("paper_id"),
+            "kind": metadata.get("kind"),
+            "timestamp": datetime.now().isoformat()
+        }, default=str) + "\n")
+        if "paper_id" in metadata and "kind" in metadata:
+            self.put_artifact(thread_id, metadata["paper_id"], metadata["kind"], metadata.get("artifact", {}))
+        if len(self._pending_messages) >= self.batch_size:
+            self._flush_messages()
+
+    # --- Artifact API -------------------------------------------------------------------
+
+    def put_artifact(self, thread_id, paper_id, kind, artifact):
+        """
+        Record (or replace) one artifact of the given kind for a paper.
+        """
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        key = (thread_id, paper_id)
+        record = self._load(key) or {}
+        record[kind] = artifact
+        self._resident[key] = record
+        self._resident.move_to_end(key)
+        self._evict()
+
+    def get_artifact(self, thread_id, paper_id, kind=None):
+        """
+        Look up the artifacts for a paper.
+
+        :param kind: Return only this artifact kind; if None, return all kinds as a dict
+        :return: The artifact(s), or None if the paper is unknown
+        """
+        record = self._load((thread_id, paper_id))
+        if record is None:
+            return None
+        return record.get(kind) if kind else record
+
+    def papers(self, thread_id):
+        """Return the ids of all papers with artifacts in a thread."""
+        keys = list(self._resident) + list(self._spilled)
+        return list(dict.fromkeys(paper_id for t, paper_id in keys if t == thread_id))
+
+    def message_count(self, thread_id):
+        """Total number of messages appended to a thread (including ones no longer resident)."""
+        return self._message_counts.get(thread_id, 0)
+
+    def stats(self):
+        """Resident/spilled counts, suitable for trace logging."""
+        return {
+            "threads": len(self._threads),
+            "resident_papers": len(self._resident),
+            "spilled_papers": len(self._spilled),
+            "spill_bytes": self._spill_size + self._pending_spill_bytes
+        }
+
+    def flush(self):
+        """Write all pending spill records and messages to disk."""
+        self._flush_spill()
+        self._flush_messages()
+
+    # --- Internals ----------------------------------------------------------------------
+
+    def _load(self, key):
+        """Return the record for key, promoting a spilled record back into memory."""
+        if key in self._resident:
+            self._resident.move_to_end(key)
+            return self._resident[key]
+        if key not in self._spilled:
+            return None
+        offset = self._spilled.pop(key)
+        if offset >= self._spill_size:
+            self._flush_spill()
+        with open(self.spill_path, 'rb') as f:
+            f.seek(offset)
+            record = json.loads(f.readline())["artifacts"]
+        self._resident[key] = record
+        self._evict()
+        return record
+
+    def _evict(self):
+        while len(self._resident) > self.max_resident_papers:
+            key, record = self._resident.popitem(last=False)
+            line = (json.dumps({"thread_id": key[0], "paper_id": key[1], "artifacts": record},
+                               default=str) + "\n").encode('utf-8')
+            self._spilled[key] = self._spill_size + self._pending_spill_bytes
+            self._pending_spill.append(line)
+            self._pending_spill_bytes += len(line)
+            if len(self._pending_spill) >= self.batch_size:
+                self._flush_spill()
+
+    def _flush_spill(self):
+        if not self._pending_spill:
+            return
+        with open(self.spill_path, 'ab') as f:
+            f.write(b"".join(self._pending_spill))
+        self._spill_size += self._pending_spill_bytes
+        self._pending_spill = []
+        self._pending_spill_bytes = 0
+
+    def _flush_messages(self):
+        if not self._pending_messages:
+            return
+        with open(self.message_log_path, 'a') as f:
+            f.write("".join(self._pending_messages))
+        self._pending_messages = []
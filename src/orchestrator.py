@@ -4,25 +4,58 @@ Stub for assignment structure.
 """
 
 
+import hashlib
 import os
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from src import config
 from src.memory.ephemeral_memory_setup import EphemeralMemory
+from src.memory.run_memory import RunMemoryRepository
 from src.utils.trace_logger import get_trace_logger
+from src.utils.token_meter import get_token_meter
 
 class ResearchCopilotOrchestrator:
-    def __init__(self, pdf_miner, pdf_parser, summarizer, synthesizer, survey_writer):
+    def __init__(self, pdf_miner, pdf_parser, summarizer, synthesizer, survey_writer, corpus_index=None,
+                 profiler=None):
         self.pdf_miner = pdf_miner
         self.pdf_parser = pdf_parser
         self.summarizer = summarizer
         self.synthesizer = synthesizer
         self.survey_writer = survey_writer
+        self.corpus_index = corpus_index
+        self.profiler = profiler
         self.trace_logger = get_trace_logger()
+        self.token_meter = get_token_meter()
         
         # Log orchestrator initialization
         self.trace_logger.log_agent_init("Orchestrator", {
             "agents": ["PDFMinerAgent", "PDFParserAgent", "SummarizerAgent", "SynthesizerAgent", "SurveyWriterAgent"]
         })
 
-    def run(self, topic=None, pdf_folder=None, thread_id="default-thread"):
+    def _profile(self, section):
+        """Profile a stage or agent call under section when --profile is on."""
+        return self.profiler.section(section) if self.profiler else nullcontext()
+
+    def _paper_metadata(self, pdf_path):
+        """
+        Stable identity and bibliographic metadata for a paper: arXiv id, title and authors
+        for mined papers, a content hash for local PDFs. paper_id keys the corpus index.
+        """
+        metadata = {"pdf_path": pdf_path}
+        if self.pdf_miner is not None:
+            metadata.update(self.pdf_miner.paper_metadata(pdf_path))
+        if metadata.get("arxiv_id"):
+            metadata["paper_id"] = f"arxiv:{metadata['arxiv_id']}"
+        else:
+            digest = hashlib.sha1()
+            with open(pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            metadata["paper_id"] = f"sha1:{digest.hexdigest()}"
+        return metadata
+
+    def run(self, topic=None, pdf_folder=None, thread_id="default-thread",
+            synthesis_stream=None, survey_stream=None, max_papers=config.DEFAULT_MAX_PAPERS):
         """
         Main workflow:
         1. (Optional) Use PDFMinerAgent to download PDFs if topic is provided.
@@ -30,68 +63,191 @@ class ResearchCopilotOrchestrator:
         3. Use SummarizerAgent to summarize each paper.
         4. Use SynthesizerAgent to synthesize insights/gaps.
         5. Use SurveyWriterAgent to generate the mini-survey.
+
+        synthesis_stream / survey_stream are optional token callbacks (e.g. StreamSink.write)
+        that receive the synthesis and survey as they are generated.
+        With a profiler, each stage and agent call is profiled as "stage:<name>" / "agent:<name>".
+        Run memory is flushed to disk however the workflow ends (early stop or error).
         """
-        # Step 1: Get PDF file paths
+        try:
+            return self._run_steps(topic, pdf_folder, thread_id, synthesis_stream, survey_stream, max_papers)
+        finally:
+            repository = EphemeralMemory.memory_repository
+            if isinstance(repository, RunMemoryRepository):
+                repository.flush()
+                self.trace_logger.log_agent_action("Orchestrator", "run_memory_stats", repository.stats())
+
+    def _run_steps(self, topic, pdf_folder, thread_id, synthesis_stream, survey_stream, max_papers):
+        """Workflow steps of run(); returns the survey, or None if the run stops early."""
+        # Step 1: Get PDF file paths (mined PDFs stream in as (rank, path) pairs while downloading)
         if topic:
             print(f"Mining PDFs for topic: {topic}")
             self.trace_logger.log_decision("Orchestrator", "use_pdf_miner", 
                                           reason=f"Topic provided: {topic}")
-            pdf_paths = self.pdf_miner.mine_pdfs()
-            self.trace_logger.log_agent_action("Orchestrator", "pdfs_mined", 
-                                              {"count": len(pdf_paths), "topic": topic})
+            pdf_source = self.pdf_miner.iter_pdfs(max_papers=max_papers)
         elif pdf_folder:
             self.trace_logger.log_decision("Orchestrator", "use_existing_pdfs",
                                           reason=f"PDF folder provided: {pdf_folder}")
             pdf_paths = [os.path.join(pdf_folder, f) for f in os.listdir(pdf_folder) if f.lower().endswith('.pdf')]
             self.trace_logger.log_agent_action("Orchestrator", "pdfs_located",
                                               {"count": len(pdf_paths), "folder": pdf_folder})
+            pdf_source = enumerate(pdf_paths)
         else:
             print("No topic or PDF folder provided.")
             self.trace_logger.log_error("Orchestrator", "No topic or PDF folder provided")
             return None
+
+        # Step 2: Parse PDFs as soon as each one is available
+        self.trace_logger.log_decision("Orchestrator", "start_parsing",
+                                       reason="Parsing PDFs as they become available")
+        parsed_texts = []
+        with self._profile("stage:parsing"):
+            for rank, pdf_path in pdf_source:
+                print(f"Parsing {pdf_path}")
+                with self._profile("agent:PDFParserAgent"):
+                    text = self.pdf_parser.parse_pdf(pdf_path)
+                metadata = self._paper_metadata(pdf_path)
+                EphemeralMemory.store_message(thread_id, "parser", f"Parsed {pdf_path}", metadata={
+                    "paper_id": metadata["paper_id"], "kind": "parse",
+                    "artifact": {"pdf_path": pdf_path, "text_length": len(text), "success": bool(text)}
+                })
+                self.trace_logger.log_memory_operation("store", thread_id, f"Parsed {pdf_path}", "parser")
+                parsed_texts.append({"pdf_path": pdf_path, "text": text, "rank": rank, "metadata": metadata})
+        # Downloads finish out of order; restore search-rank order for summarization
+        parsed_texts.sort(key=lambda parsed: parsed["rank"])
+        pdf_paths = [parsed["pdf_path"] for parsed in parsed_texts]
+        if topic:
+            self.trace_logger.log_agent_action("Orchestrator", "pdfs_mined", 
+                                              {"count": len(pdf_paths), "topic": topic})
         if not pdf_paths:
             print("No PDFs found.")
             self.trace_logger.log_error("Orchestrator", "No PDFs found")
             return None
 
-        # Step 2: Parse PDFs
-        self.trace_logger.log_decision("Orchestrator", "start_parsing",
-                                       reason=f"Processing {len(pdf_paths)} PDFs")
-        parsed_texts = []
-        for pdf_path in pdf_paths:
-            print(f"Parsing {pdf_path}")
-            text = self.pdf_parser.parse_pdf(pdf_path)
-            EphemeralMemory.store_message(thread_id, "parser", f"Parsed {pdf_path}")
-            self.trace_logger.log_memory_operation("store", thread_id, f"Parsed {pdf_path}", "parser")
-            parsed_texts.append({"pdf_path": pdf_path, "text": text})
-
         # Step 3: Summarize each paper
         self.trace_logger.log_decision("Orchestrator", "start_summarization",
                                        reason=f"Summarizing {len(parsed_texts)} papers")
-        summaries = []
-        for parsed in parsed_texts:
-            print(f"Summarizing {parsed['pdf_path']}")
-            summary = self.summarizer.summarize(parsed["text"], metadata={"pdf_path": parsed["pdf_path"]})
-            EphemeralMemory.store_message(thread_id, "summarizer", f"Summarized {parsed['pdf_path']}")
-            self.trace_logger.log_memory_operation("store", thread_id, f"Summarized {parsed['pdf_path']}", "summarizer")
-            summaries.append(summary)
+        with self._profile("stage:summarization"):
+            if getattr(self.summarizer, "batch_backend", None) is not None:
+                self.trace_logger.log_decision("Orchestrator", "use_batch_summarization",
+                                               reason=f"Batch backend: {self.summarizer.batch_backend.name}")
+                summaries = self._summarize_batch(parsed_texts, thread_id)
+            else:
+                summaries = self._summarize_all(parsed_texts, thread_id)
+
+        if self.token_meter.budget_level() == "exhausted":
+            print("Token budget exhausted; stopping before synthesis.")
+            self.trace_logger.log_error("Orchestrator", "Token budget exhausted before synthesis",
+                                        error_type="BudgetExceededError")
+            return None
 
         # Step 4: Synthesize insights/gaps
         print("Synthesizing cross-paper insights and gaps")
         self.trace_logger.log_decision("Orchestrator", "start_synthesis",
                                        reason=f"Synthesizing insights from {len(summaries)} summaries")
-        synthesis = self.synthesizer.synthesize(summaries)
+        with self._profile("stage:synthesis"), self._profile("agent:SynthesizerAgent"):
+            synthesis = self.synthesizer.synthesize(summaries, stream_to=synthesis_stream)
         EphemeralMemory.store_message(thread_id, "synthesizer", "Synthesized insights and gaps")
         self.trace_logger.log_memory_operation("store", thread_id, "Synthesized insights and gaps", "synthesizer")
 
+        # Step 4b: Add this run's summaries to the cross-run corpus index
+        if self.corpus_index is not None:
+            with self._profile("stage:corpus_index"):
+                added = self.corpus_index.add_many(
+                    (s["summary"], s.get("metadata"), (s.get("metadata") or {}).get("paper_id"))
+                    for s in summaries if s.get("summary")
+                )
+                self.corpus_index.maybe_rebuild_ivf()
+            self.trace_logger.log_agent_action("Orchestrator", "corpus_index_updated",
+                                              {"added": added, "size": len(self.corpus_index)})
+
+        if self.token_meter.budget_level() == "exhausted":
+            print("Token budget exhausted; stopping before survey writing.")
+            self.trace_logger.log_error("Orchestrator", "Token budget exhausted before survey writing",
+                                        error_type="BudgetExceededError")
+            return None
+
         # Step 5: Generate mini-survey
         print("Generating mini-survey")
         self.trace_logger.log_decision("Orchestrator", "start_survey_writing",
                                        reason="All summaries and synthesis complete")
-        survey = self.survey_writer.write_survey(synthesis, summaries)
+        with self._profile("stage:survey_writing"), self._profile("agent:SurveyWriterAgent"):
+            survey = self.survey_writer.write_survey(synthesis, summaries, stream_to=survey_stream)
         EphemeralMemory.store_message(thread_id, "survey_writer", "Generated mini-survey")
         self.trace_logger.log_memory_operation("store", thread_id, "Generated mini-survey", "survey_writer")
 
         self.trace_logger.log_agent_action("Orchestrator", "workflow_steps_complete",
-                                          {"total_pdfs": len(pdf_paths), "summaries": len(summaries)})
+                                          {"total_pdfs": len(pdf_paths), "summaries": len(summaries),
+                                           "token_usage": self.token_meter.snapshot()["run"]})
         return survey
+
+    def _store_summary(self, thread_id, parsed, summary):
+        """Record a paper's summary (and token usage) in run memory, keyed by its paper_id."""
+        pdf_path, paper_id = parsed["pdf_path"], parsed["metadata"]["paper_id"]
+        EphemeralMemory.store_message(thread_id, "summarizer", f"Summarized {pdf_path}", metadata={
+            "paper_id": paper_id, "kind": "summary",
+            "artifact": {"summary": summary["summary"], "summary_length": len(summary["summary"])}
+        })
+        if summary.get("tokens"):
+            EphemeralMemory.store_message(thread_id, "summarizer", f"Tokens for {pdf_path}", metadata={
+                "paper_id": paper_id, "kind": "tokens", "artifact": summary["tokens"]
+            })
+        self.trace_logger.log_memory_operation("store", thread_id, f"Summarized {pdf_path}", "summarizer")
+
+    def _summarize_batch(self, parsed_texts, thread_id):
+        """Summarize all papers in offline batch jobs, then record the results in run memory."""
+        with self._profile("agent:SummarizerAgent"):
+            summaries = self.summarizer.summarize_batch(parsed_texts)
+        for parsed, summary in zip(parsed_texts, summaries):
+            self._store_summary(thread_id, parsed, summary)
+        return summaries
+
+    def _summarize_all(self, parsed_texts, thread_id):
+        """
+        Summarize papers with up to summarizer.concurrency calls in flight.
+        Papers are submitted in search-rank order and summaries are returned in that order.
+        Each submission reserves its estimated usage in the token meter until it completes, so
+        calls in flight count against the budget; once the budget is critical, or the next paper
+        would not fit, the remaining lower-ranked papers are not submitted.
+        """
+        workers = max(1, getattr(self.summarizer, "concurrency", 1))
+        summarize = self.summarizer.summarize
+        if self.profiler:
+            # Worker threads are profiled separately from the orchestrator thread
+            summarize = self.profiler.wrap("agent:SummarizerAgent", summarize)
+        results = [None] * len(parsed_texts)
+        in_flight = {}
+
+        def collect(futures):
+            for future in futures:
+                rank, reservation = in_flight.pop(future)
+                try:
+                    summary = future.result()
+                finally:
+                    self.token_meter.release(reservation)
+                self._store_summary(thread_id, parsed_texts[rank], summary)
+                results[rank] = summary
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for rank, parsed in enumerate(parsed_texts):
+                if len(in_flight) >= workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                # Papers are in search-rank order, so under budget pressure the lowest-ranked ones are dropped
+                estimate = self.summarizer.estimate_usage(parsed["text"])
+                level = self.token_meter.budget_level()
+                if level in ("critical", "exhausted") or not self.token_meter.fits(*estimate):
+                    print(f"Budget {level}: skipping {len(parsed_texts) - rank} lower-ranked papers")
+                    self.trace_logger.log_decision("Orchestrator", "skip_low_ranked_papers",
+                                                   reason=f"Token budget {level} with "
+                                                          f"{self.token_meter.reserved['calls']} calls in flight",
+                                                   context={"skipped": [p["pdf_path"] for p in parsed_texts[rank:]],
+                                                            "token_usage": self.token_meter.snapshot()["run"]})
+                    break
+                print(f"Summarizing {parsed['pdf_path']}")
+                reservation = self.token_meter.reserve(*estimate)
+                future = executor.submit(summarize, parsed["text"],
+                                         metadata=parsed["metadata"])
+                in_flight[future] = (rank, reservation)
+            collect(list(in_flight))
+        return [summary for summary in results if summary is not None]
@@ -3,5 +3,9 @@ Utilities module for research copilot.
 """
 
 from .trace_logger import TraceLogger, get_trace_logger
+from .token_meter import TokenMeter, BudgetExceededError, get_token_meter
+from .stream_sink import StreamSink
+from .profiler import RunProfiler
 
-__all__ = ['TraceLogger', 'get_trace_logger']
+__all__ = ['TraceLogger', 'get_trace_logger', 'TokenMeter', 'BudgetExceededError', 'get_token_meter',
+           'StreamSink', 'RunProfiler']
@@ -0,0 +1,174 @@
+"""
+Run Profiler - per-stage and per-agent CPU profiling for a single run.
+
+Sections (e.g. "stage:parsing", "agent:PDFParserAgent") are profiled with cProfile;
+a nested section pauses its parent so time is attributed to the innermost one.
+A background sampler also records full call stacks per section in collapsed-stack
+format for flamegraph tools (flamegraph.pl, speedscope, inferno).
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from src import config
+from src.utils.trace_logger import get_trace_logger
+
+
+class RunProfiler:
+    """
+    Collects cProfile data per section across all threads and writes
+    <section>.pstats, all.pstats and stacks.collapsed into output_dir.
+    """
+
+    def __init__(self, output_dir, sample_interval=config.PROFILE_SAMPLE_INTERVAL,
+                 top_n=config.PROFILE_TOP_N):
+        """
+        :param output_dir: Directory for the profile artifacts
+        :param sample_interval: Seconds between stack samples (0 disables the sampler)
+        :param top_n: Number of hot functions per section recorded in the trace
+        """
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.top_n = top_n
+        self.trace_logger = get_trace_logger()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiles = defaultdict(list)
+        self._wall_time = defaultdict(float)
+        self._active = {}  # thread id -> innermost section name
+        self._samples = defaultdict(int)
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        """Start the background stack sampler."""
+        if self.sample_interval and self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name="RunProfilerSampler", daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def section(self, name):
+        """Profile the enclosed block under name on the current thread."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            self._toggle(stack[-1][1], False)
+        profile = cProfile.Profile()
+        stack.append((name, profile))
+        thread_id = threading.get_ident()
+        self._active[thread_id] = name
+        started = time.perf_counter()
+        enabled = self._toggle(profile, True)
+        try:
+            yield
+        finally:
+            if enabled:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                if enabled:
+                    self._profiles[name].append(profile)
+                self._wall_time[name] += elapsed
+            if stack:
+                self._active[thread_id] = stack[-1][0]
+                self._toggle(stack[-1][1], True)
+            else:
+                self._active.pop(thread_id, None)
+
+    @staticmethod
+    def _toggle(profile, enable):
+        """
+        Enable or disable a profile. Returns False when the interpreter refuses a second
+        active profiler (Python 3.12+ allows one per process); the section then only
+        gets wall time and stack samples.
+        """
+        try:
+            profile.enable() if enable else profile.disable()
+            return True
+        except ValueError:
+            return False
+
+    def wrap(self, name, func):
+        """Return func wrapped in section(name), e.g. for work submitted to a thread pool."""
+        def profiled(*args, **kwargs):
+            with self.section(name):
+                return func(*args, **kwargs)
+        return profiled
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                section = self._active.get(thread_id)
+                if thread_id == own_id or section is None:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._samples[";".join([section] + frames[::-1])] += 1
+
+    @staticmethod
+    def _file_name(section):
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", section)
+
+    def _hot_functions(self, stats):
+        rows = []
+        for func in sorted(stats.stats, key=lambda f: stats.stats[f][2], reverse=True)[:self.top_n]:
+            calls, _, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            rows.append({
+                "function": name if filename == "~" else f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "tottime_s": round(tottime, 4),
+                "cumtime_s": round(cumtime, 4)
+            })
+        return rows
+
+    def finish(self):
+        """
+        Stop sampling, write the profile artifacts and log the hottest functions
+        per section to the trace. Returns a dict of written file paths.
+        """
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(self.output_dir, exist_ok=True)
+        files = {}
+        all_profiles = []
+        for section, wall_time in sorted(self._wall_time.items()):
+            summary = {"wall_time_s": round(wall_time, 3)}
+            profiles = self._profiles.get(section)
+            if profiles:
+                stats = pstats.Stats(*profiles)
+                path = os.path.join(self.output_dir, f"{self._file_name(section)}.pstats")
+                stats.dump_stats(path)
+                files[section] = path
+                all_profiles.extend(profiles)
+                summary.update({
+                    "profiled_time_s": round(stats.total_tt, 3),
+                    "profiled_calls": len(profiles),
+                    "hot_functions": self._hot_functions(stats)
+                })
+            self.trace_logger.log_custom("profile_section", section=section, **summary)
+        if all_profiles:
+            files["all"] = os.path.join(self.output_dir, "all.pstats")
+            pstats.Stats(*all_profiles).dump_stats(files["all"])
+        if self._samples:
+            files["collapsed"] = os.path.join(self.output_dir, "stacks.collapsed")
+            with open(files["collapsed"], 'w') as f:
+                for stack, count in sorted(self._samples.items()):
+                    f.write(f"{stack} {count}\n")
+        self.trace_logger.log_custom("profile_complete", output_dir=self.output_dir, files=files,
+                                     samples=sum(self._samples.values()))
+        return files
@@ -0,0 +1,67 @@
+"""
+Stream Sink - writes LLM tokens to a file (and stdout) as they arrive.
+"""
+
+import os
+import sys
+
+
+def partial_path(path: str) -> str:
+    """Path a StreamSink for path writes to until commit(); tail this file to follow a run live."""
+    return path + '.part'
+
+
+class StreamSink:
+    """
+    File-backed sink for streamed tokens. Each token is flushed immediately so
+    readers tailing the file (or the terminal) see output while it is generated.
+
+    Tokens go to <path>.part, opened on the first token; commit() renames it over
+    path, so a run that stops early or fails never truncates a previous good output.
+    """
+
+    def __init__(self, path: str, echo: bool = True):
+        """
+        :param path: File that receives the output on commit()
+        :param echo: Also write tokens to stdout
+        """
+        self.path = path
+        self.part_path = partial_path(path)
+        self.echo = echo
+        self.chars_written = 0
+        self.file_handle = None
+
+    def write(self, token: str):
+        """Append a token to the partial file (and stdout)."""
+        if self.file_handle is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file_handle = open(self.part_path, 'w')
+        self.file_handle.write(token)
+        self.file_handle.flush()
+        self.chars_written += len(token)
+        if self.echo:
+            sys.stdout.write(token)
+            sys.stdout.flush()
+
+    def commit(self) -> bool:
+        """Close the sink and move the streamed output into place. Returns False if nothing was streamed."""
+        self.close()
+        if not self.chars_written:
+            return False
+        os.replace(self.part_path, self.path)
+        return True
+
+    def close(self):
+        """Close the partial file; without commit() it is left as <path>.part."""
+        if self.file_handle is not None and not self.file_handle.closed:
+            self.file_handle.close()
+            if self.echo and self.chars_written:
+                sys.stdout.write('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
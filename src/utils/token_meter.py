@@ -0,0 +1,213 @@
+"""
+Token Meter - aggregates LLM token usage and cost per agent and per run,
+and enforces an optional per-run token/cost budget.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from src import config
+from src.utils.trace_logger import get_trace_logger
+
+# Budget levels, in order of severity
+BUDGET_LEVELS = ("normal", "degraded", "critical", "exhausted")
+
+# Logical agent (e.g. "SummarizerAgent") that LLM calls are attributed to
+_current_agent: ContextVar[Optional[str]] = ContextVar("token_meter_agent", default=None)
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when an LLM call is attempted after the run budget is exhausted."""
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the USD cost of a call from config.MODEL_PRICING (per 1M tokens).
+    Unknown models cost 0.
+    """
+    prices = config.MODEL_PRICING.get(model)
+    if prices is None:
+        # Dated snapshots such as gpt-4o-mini-2024-07-18 fall back to their longest matching base model
+        bases = [name for name in config.MODEL_PRICING if model and model.startswith(name + "-")]
+        if not bases:
+            return 0.0
+        prices = config.MODEL_PRICING[max(bases, key=len)]
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def _empty_usage() -> Dict:
+    return {"calls": 0, "prompt": 0, "completion": 0, "total": 0, "cost": 0.0}
+
+
+class TokenMeter:
+    """
+    Thread-safe meter of LLM usage with a per-run budget.
+
+    The budget level rises from "normal" to "degraded" and "critical" as usage
+    approaches the budget, so agents can degrade gracefully, and reaches
+    "exhausted" at 100%, after which check() refuses further calls.
+
+    Callers that submit work concurrently reserve each call's estimated usage
+    (reserve/release); levels count reservations, so decisions made while calls
+    are still in flight already see their cost.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = config.TOKEN_BUDGET,
+                 max_cost: Optional[float] = config.COST_BUDGET):
+        """
+        :param max_tokens: Total token budget for the run (None for unlimited)
+        :param max_cost: USD budget for the run (None for unlimited)
+        """
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self._lock = threading.Lock()
+        self.run = _empty_usage()
+        self.by_agent: Dict[str, Dict] = {}
+        self.by_model: Dict[str, Dict] = {}
+        self.reserved = {"calls": 0, "total": 0, "cost": 0.0}
+        self.level = "normal"
+        self.trace_logger = get_trace_logger()
+
+    @contextmanager
+    def attribute(self, agent_name: str):
+        """Attribute LLM calls made inside this block to agent_name."""
+        token = _current_agent.set(agent_name)
+        try:
+            yield
+        finally:
+            _current_agent.reset(token)
+
+    def record(self, agent_name: str, model: str, tokens: Optional[Dict[str, int]]):
+        """
+        Record the usage of one LLM call and log the live meter to the trace.
+
+        :param agent_name: Fallback agent name when the call is not inside attribute()
+        :param model: Model that served the call
+        :param tokens: Usage dict with prompt/completion/total keys (None if unavailable)
+        """
+        tokens = tokens or {}
+        agent = _current_agent.get() or agent_name
+        prompt, completion = tokens.get("prompt", 0) or 0, tokens.get("completion", 0) or 0
+        total = tokens.get("total") or prompt + completion
+        cost = llm_cost(model, prompt, completion)
+        with self._lock:
+            for bucket in (self.run, self.by_agent.setdefault(agent, _empty_usage()),
+                           self.by_model.setdefault(model, _empty_usage())):
+                bucket["calls"] += 1
+                bucket["prompt"] += prompt
+                bucket["completion"] += completion
+                bucket["total"] += total
+                bucket["cost"] += cost
+            previous, self.level = self.level, self._compute_level()
+            level, run_totals, reserved = self.level, dict(self.run), dict(self.reserved)
+        self.trace_logger.log_custom("token_meter", agent=agent, model=model, tokens=tokens,
+                                     cost=round(cost, 6), run_totals=run_totals,
+                                     budget_used=round(self.budget_used(), 4), budget_level=level)
+        self._log_level_change(previous, level, run_totals, reserved)
+
+    def _log_level_change(self, previous: str, level: str, run_totals: Dict, reserved: Dict):
+        if level != previous:
+            self.trace_logger.log_decision("TokenMeter", f"budget_{level}",
+                                           reason=f"{self.projected_used():.0%} of run budget used or reserved",
+                                           context={"run_totals": run_totals, "reserved": reserved})
+
+    def reserve(self, model: str, prompt_tokens: int, completion_tokens: int) -> Dict:
+        """
+        Reserve the estimated usage of a call that is about to be submitted.
+        Returns a reservation to pass to release() once the call has been recorded.
+        """
+        reservation = {"total": prompt_tokens + completion_tokens,
+                       "cost": llm_cost(model, prompt_tokens, completion_tokens)}
+        with self._lock:
+            self.reserved["calls"] += 1
+            self.reserved["total"] += reservation["total"]
+            self.reserved["cost"] += reservation["cost"]
+            previous, self.level = self.level, self._compute_level()
+            level, run_totals, reserved = self.level, dict(self.run), dict(self.reserved)
+        self._log_level_change(previous, level, run_totals, reserved)
+        return reservation
+
+    def release(self, reservation: Dict):
+        """Release a reservation made by reserve()."""
+        with self._lock:
+            self.reserved["calls"] -= 1
+            self.reserved["total"] -= reservation["total"]
+            self.reserved["cost"] -= reservation["cost"]
+            previous, self.level = self.level, self._compute_level()
+            level, run_totals, reserved = self.level, dict(self.run), dict(self.reserved)
+        self._log_level_change(previous, level, run_totals, reserved)
+
+    def fits(self, model: str, prompt_tokens: int, completion_tokens: int) -> bool:
+        """Whether a call of this estimated size fits in the budget left after usage and reservations."""
+        with self._lock:
+            return self._fraction(self.run["total"] + self.reserved["total"] + prompt_tokens + completion_tokens,
+                                  self.run["cost"] + self.reserved["cost"]
+                                  + llm_cost(model, prompt_tokens, completion_tokens)) <= 1.0
+
+    def _fraction(self, total: int, cost: float) -> float:
+        fractions = [0.0]
+        if self.max_tokens:
+            fractions.append(total / self.max_tokens)
+        if self.max_cost:
+            fractions.append(cost / self.max_cost)
+        return max(fractions)
+
+    def budget_used(self) -> float:
+        """Fraction of the tightest budget consumed so far (0.0 when no budget is set)."""
+        return self._fraction(self.run["total"], self.run["cost"])
+
+    def projected_used(self) -> float:
+        """Fraction of the tightest budget consumed or reserved by calls in flight."""
+        return self._fraction(self.run["total"] + self.reserved["total"], self.run["cost"] + self.reserved["cost"])
+
+    def _compute_level(self) -> str:
+        if self.budget_used() >= 1.0:
+            return "exhausted"
+        # Reservations alone never exhaust the budget; they only make it critical
+        used = self.projected_used()
+        if used >= config.BUDGET_CRITICAL_AT:
+            return "critical"
+        if used >= config.BUDGET_DEGRADE_AT:
+            return "degraded"
+        return "normal"
+
+    def budget_level(self) -> str:
+        """Current budget level: one of BUDGET_LEVELS."""
+        return self.level
+
+    def check(self):
+        """Raise BudgetExceededError if the run budget is exhausted by actual (not reserved) usage."""
+        if self.budget_used() >= 1.0:
+            raise BudgetExceededError(f"Run budget exhausted ({self.budget_used():.0%} used)")
+
+    def snapshot(self) -> Dict:
+        """Serializable view of the meter for the trace and the run config JSON."""
+        with self._lock:
+            return {
+                "budget": {"max_tokens": self.max_tokens, "max_cost": self.max_cost},
+                "budget_used": round(self.budget_used(), 4),
+                "budget_level": self.level,
+                "reserved": {**self.reserved, "cost": round(self.reserved["cost"], 6)},
+                "run": {**self.run, "cost": round(self.run["cost"], 6)},
+                "by_agent": {k: {**v, "cost": round(v["cost"], 6)} for k, v in self.by_agent.items()},
+                "by_model": {k: {**v, "cost": round(v["cost"], 6)} for k, v in self.by_model.items()},
+            }
+
+
+# Singleton pattern
+_global_token_meter: Optional[TokenMeter] = None
+
+
+def get_token_meter(**kwargs) -> TokenMeter:
+    """
+    Get or create the global token meter instance.
+
+    :param kwargs: TokenMeter options such as max_tokens and max_cost (only used on first call)
+    :return: TokenMeter instance
+    """
+    global _global_token_meter
+    if _global_token_meter is None:
+        _global_token_meter = TokenMeter(**kwargs)
+    return _global_token_meter
@@ -0,0 +1,315 @@
+"""
+Trace Analyzer - streaming analysis of trace.jsonl files.
+
+Reads the trace one line at a time (never loading the whole file) and reports
+per-agent call counts, LLM token totals and cost, error rates, the slowest
+papers and a stage timeline. Two traces can be diffed to spot regressions.
+
+Usage:
+    python -m src.utils.trace_analyzer logs/trace.jsonl
+    python -m src.utils.trace_analyzer logs/trace.jsonl --diff logs/trace_baseline.jsonl
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from src.utils.token_meter import llm_cost
+from src.utils.trace_logger import open_trace, trace_segments
+
+# Events that are only counted; everything else is fully parsed
+_COUNT_ONLY_EVENTS = {b"memory_operation", b"agent_init", b"tool_call"}
+_EVENT_KEY = b'"event": "'
+
+# Orchestrator decisions that mark the start of a workflow stage
+_STAGE_DECISIONS = {
+    "use_pdf_miner": "mining",
+    "use_existing_pdfs": "locating",
+    "start_parsing": "parsing",
+    "start_summarization": "summarization",
+    "start_synthesis": "synthesis",
+    "start_survey_writing": "survey_writing",
+}
+
+# (agent, start action, complete action, path to the paper id in details)
+_PAPER_SPANS = [
+    ("PDFParserAgent", "parse_start", "parse_complete", ("pdf_path",)),
+    ("SummarizerAgent", "summarize_start", "summarize_complete", ("metadata", "pdf_path")),
+]
+
+
+def _event_type(line):
+    """Extract the event type from a raw trace line without JSON-decoding it."""
+    start = line.find(_EVENT_KEY)
+    if start < 0:
+        return None
+    start += len(_EVENT_KEY)
+    end = line.find(b'"', start)
+    return line[start:end]
+
+
+def _stream_lines(trace_file):
+    """Yield raw lines from every segment of a run's trace, oldest first."""
+    for path in trace_segments(trace_file) or [trace_file]:
+        with open_trace(path) as f:
+            yield from f
+
+
+def _dig(details, path):
+    for key in path:
+        if not isinstance(details, dict):
+            return None
+        details = details.get(key)
+    return details
+
+
+def analyze_trace(trace_file, top_n=5):
+    """
+    Stream a trace file and compute summary metrics.
+
+    :param trace_file: Path to a trace.jsonl file; rolled segments of the same run are included
+    :param top_n: Number of slowest papers to report
+    :return: Dict of metrics (see format_report for the layout)
+    """
+    event_counts = defaultdict(int)
+    agent_actions = defaultdict(int)
+    agent_errors = defaultdict(int)
+    llm = defaultdict(lambda: {"calls": 0, "prompt": 0, "completion": 0, "total": 0, "cost": 0.0})
+    pending_model = {}
+    pdf_ops = defaultdict(lambda: {"ok": 0, "failed": 0})
+    open_spans = {}
+    paper_times = defaultdict(float)
+    stages = []
+    first_ts = last_ts = None
+    malformed = 0
+    sampling = {}
+
+    for line in _stream_lines(trace_file):
+        event_type = _event_type(line)
+        if event_type is None:
+            if line.strip():
+                malformed += 1
+            continue
+        if event_type in _COUNT_ONLY_EVENTS:
+            event_counts[event_type.decode()] += 1
+            continue
+        try:
+            event = json.loads(line)
+            ts = datetime.fromisoformat(event["timestamp"]) if "timestamp" in event else None
+        except (ValueError, TypeError):
+            malformed += 1
+            continue
+        name = event.get("event")
+        event_counts[name] += 1
+        if ts is not None:
+            first_ts = first_ts or ts
+            last_ts = ts
+        agent = event.get("agent") or event.get("component") or "unknown"
+
+        if name == "agent_action":
+            action = event.get("action")
+            agent_actions[agent] += 1
+            for span_agent, start, complete, path in _PAPER_SPANS:
+                if agent != span_agent or action not in (start, complete):
+                    continue
+                paper = _dig(event.get("details"), path)
+                if paper is None or ts is None:
+                    continue
+                if action == start:
+                    open_spans[(agent, paper)] = ts
+                elif (agent, paper) in open_spans:
+                    paper_times[paper] += (ts - open_spans.pop((agent, paper))).total_seconds()
+        elif name == "llm_request":
+            pending_model[agent] = event.get("model", "unknown")
+        elif name == "llm_response":
+            model = event.get("model") or pending_model.pop(agent, "unknown")
+            stats = llm[model]
+            stats["calls"] += 1
+            tokens = event.get("tokens") or {}
+            stats["prompt"] += tokens.get("prompt", 0)
+            stats["completion"] += tokens.get("completion", 0)
+            stats["total"] += tokens.get("total", 0)
+            stats["cost"] += llm_cost(model, tokens.get("prompt", 0), tokens.get("completion", 0))
+        elif name == "error":
+            agent_errors[agent] += 1
+        elif name == "pdf_operation":
+            key = f"{agent}:{event.get('operation')}"
+            pdf_ops[key]["ok" if event.get("success") else "failed"] += 1
+        elif name == "decision" and event.get("decision") in _STAGE_DECISIONS and ts is not None:
+            stages.append((_STAGE_DECISIONS[event["decision"]], ts))
+        elif name == "workflow_complete" and ts is not None:
+            stages.append(("complete", ts))
+        elif name == "trace_config" and event.get("sample_rates"):
+            sampling["sample_rates"] = event["sample_rates"]
+        elif name == "trace_stats":
+            sampling["dropped"] = event.get("dropped", {})
+
+    timeline = []
+    for i, (stage, ts) in enumerate(stages):
+        if stage == "complete":
+            continue
+        end = stages[i + 1][1] if i + 1 < len(stages) else last_ts
+        timeline.append({
+            "stage": stage,
+            "offset_s": round((ts - first_ts).total_seconds(), 3),
+            "duration_s": round((end - ts).total_seconds(), 3)
+        })
+
+    # Errors are never sampled out, so scale sampled actions back up before computing error rates;
+    # with actions dropped entirely there is no rate to report
+    action_rate = sampling.get("sample_rates", {}).get("agent_action", 1.0)
+    agents = {}
+    for agent in sorted(set(agent_actions) | set(agent_errors)):
+        actions, errors = agent_actions[agent], agent_errors[agent]
+        estimated = actions / action_rate if action_rate > 0 else None
+        if estimated is None:
+            error_rate = None
+        else:
+            error_rate = round(errors / (estimated + errors), 4) if estimated + errors else 0.0
+        agents[agent] = {
+            "actions": actions,
+            "errors": errors,
+            "error_rate": error_rate
+        }
+
+    llm_totals = {
+        "calls": sum(s["calls"] for s in llm.values()),
+        "prompt": sum(s["prompt"] for s in llm.values()),
+        "completion": sum(s["completion"] for s in llm.values()),
+        "total": sum(s["total"] for s in llm.values()),
+        "cost": round(sum(s["cost"] for s in llm.values()), 6),
+    }
+    for stats in llm.values():
+        stats["cost"] = round(stats["cost"], 6)
+
+    slowest = sorted(paper_times.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    return {
+        "trace_file": str(trace_file),
+        "duration_s": round((last_ts - first_ts).total_seconds(), 3) if first_ts else 0.0,
+        "events": dict(sorted(event_counts.items())),
+        "malformed_lines": malformed,
+        "agents": agents,
+        "llm": {"by_model": dict(llm), "totals": llm_totals},
+        "pdf_operations": dict(pdf_ops),
+        "slowest_papers": [{"paper": p, "seconds": round(s, 3)} for p, s in slowest],
+        "timeline": timeline,
+        "sampling": sampling,
+    }
+
+
+def diff_traces(current, baseline, threshold=0.10):
+    """
+    Compare two analyze_trace results.
+
+    :param current: Metrics of the run under test
+    :param baseline: Metrics of the reference run
+    :param threshold: Relative increase flagged as a regression
+    :return: List of dicts with metric, baseline, current, change and regression flag
+    """
+    def metric_rows():
+        yield "duration_s", baseline["duration_s"], current["duration_s"]
+        for key in ("calls", "prompt", "completion", "total", "cost"):
+            yield f"llm.{key}", baseline["llm"]["totals"][key], current["llm"]["totals"][key]
+        stages = {t["stage"] for t in baseline["timeline"]} | {t["stage"] for t in current["timeline"]}
+        base_stages = {t["stage"]: t["duration_s"] for t in baseline["timeline"]}
+        cur_stages = {t["stage"]: t["duration_s"] for t in current["timeline"]}
+        for stage in sorted(stages):
+            yield f"stage.{stage}_s", base_stages.get(stage, 0.0), cur_stages.get(stage, 0.0)
+        for agent in sorted(set(baseline["agents"]) | set(current["agents"])):
+            base_rate = baseline["agents"].get(agent, {}).get("error_rate", 0.0)
+            cur_rate = current["agents"].get(agent, {}).get("error_rate", 0.0)
+            if base_rate is not None and cur_rate is not None:
+                yield f"agent.{agent}.error_rate", base_rate, cur_rate
+
+    rows = []
+    for metric, base, cur in metric_rows():
+        # A metric that was zero in the baseline has no relative change; any increase is a regression
+        change = (cur - base) / base if base else None
+        rows.append({
+            "metric": metric,
+            "baseline": base,
+            "current": cur,
+            "change": change,
+            "regression": change > threshold if change is not None else cur > base
+        })
+    return rows
+
+
+def format_report(metrics):
+    """Render analyze_trace metrics as a plain-text report."""
+    lines = [f"Trace: {metrics['trace_file']}", f"Duration: {metrics['duration_s']:.1f}s", ""]
+    lines.append("Events:")
+    lines += [f"  {name:<20} {count:>8}" for name, count in metrics["events"].items()]
+    if metrics["malformed_lines"]:
+        lines.append(f"  {'(malformed)':<20} {metrics['malformed_lines']:>8}")
+
+    lines += ["", "Agents:", f"  {'agent':<22} {'actions':>8} {'errors':>7} {'error rate':>11}"]
+    for agent, stats in metrics["agents"].items():
+        rate = "n/a" if stats["error_rate"] is None else f"{stats['error_rate']:.1%}"
+        lines.append(f"  {agent:<22} {stats['actions']:>8} {stats['errors']:>7} {rate:>11}")
+
+    lines += ["", "LLM usage:", f"  {'model':<22} {'calls':>6} {'prompt':>10} {'completion':>11} {'cost $':>10}"]
+    for model, stats in list(metrics["llm"]["by_model"].items()) + [("TOTAL", metrics["llm"]["totals"])]:
+        lines.append(f"  {model:<22} {stats['calls']:>6} {stats['prompt']:>10} "
+                     f"{stats['completion']:>11} {stats['cost']:>10.4f}")
+
+    if metrics["pdf_operations"]:
+        lines += ["", "PDF operations:"]
+        for op, stats in metrics["pdf_operations"].items():
+            lines.append(f"  {op:<30} ok={stats['ok']} failed={stats['failed']}")
+
+    if metrics["slowest_papers"]:
+        lines += ["", "Slowest papers (parse + summarize):"]
+        lines += [f"  {p['seconds']:>8.2f}s  {p['paper']}" for p in metrics["slowest_papers"]]
+
+    if metrics["sampling"]:
+        lines += ["", f"Sampled trace: rates={metrics['sampling'].get('sample_rates', {})} "
+                      f"dropped={metrics['sampling'].get('dropped', {})} (counts above are sampled)"]
+
+    if metrics["timeline"]:
+        lines += ["", "Stage timeline:"]
+        lines += [f"  +{t['offset_s']:>8.2f}s  {t['stage']:<16} {t['duration_s']:>8.2f}s"
+                  for t in metrics["timeline"]]
+    return "\n".join(lines)
+
+
+def format_diff(rows):
+    """Render diff_traces rows as a plain-text table."""
+    lines = [f"  {'metric':<40} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for row in rows:
+        change = "n/a" if row["change"] is None else f"{row['change']:+.1%}"
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(f"  {row['metric']:<40} {row['baseline']:>12.4g} {row['current']:>12.4g} {change:>9}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a Research Co-Pilot trace.jsonl file")
+    parser.add_argument('trace_file', help='Trace file to analyze')
+    parser.add_argument('--diff', metavar='BASELINE', help='Baseline trace file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative increase reported as a regression in --diff mode (default: 0.10)')
+    parser.add_argument('--top', type=int, default=5, help='Number of slowest papers to show (default: 5)')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON instead of a report')
+    args = parser.parse_args(argv)
+
+    metrics = analyze_trace(args.trace_file, top_n=args.top)
+    if args.diff:
+        baseline = analyze_trace(args.diff, top_n=args.top)
+        rows = diff_traces(metrics, baseline, threshold=args.threshold)
+        if args.json:
+            print(json.dumps({"current": metrics, "baseline": baseline, "diff": rows}, indent=2, default=str))
+        else:
+            print(format_report(metrics))
+            print(f"\nDiff against {args.diff}:")
+            print(format_diff(rows))
+        return 1 if any(row["regression"] for row in rows) else 0
+
+    print(json.dumps(metrics, indent=2) if args.json else format_report(metrics))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
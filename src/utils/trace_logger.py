@@ -1,13 +1,34 @@
 """
 Trace Logger for observability - logs all events to trace.jsonl
+
+Supports per-run trace files, size-based rotation with compression of rolled
+segments, and sampling of high-volume event types.
 """
 
+import atexit
+import gzip
+import io
 import json
+import os
+import shutil
 import threading
+import zlib
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+try:
+    import zstandard
+except ImportError:  # Optional: zstd compression of rolled segments
+    zstandard = None
+
+from src import config
+
+# Events that are never sampled out (errors, LLM usage and workflow boundaries)
+ALWAYS_KEEP_EVENTS = {'error', 'llm_request', 'llm_response', 'workflow_start', 'workflow_complete'}
+# Events flushed to disk immediately so they survive a crash
+_FLUSH_EVENTS = {'error', 'workflow_start', 'workflow_complete'}
+
 
 class TraceLogger:
     """
@@ -18,21 +39,103 @@ class TraceLogger:
     _instance = None
     _lock = threading.Lock()
     
-    def __init__(self, trace_file: str = "trace.jsonl"):
+    def __init__(self, trace_file: str = "trace.jsonl", run_id: Optional[str] = None,
+                 verbosity: str = config.TRACE_VERBOSITY,
+                 max_bytes: int = config.TRACE_MAX_BYTES,
+                 compression: Optional[str] = config.TRACE_COMPRESSION):
         """
         Initialize the trace logger.
         
         :param trace_file: Path to the JSONL trace file
+        :param run_id: If given, events go to a per-run file (trace_<run_id>.jsonl) next to trace_file
+        :param verbosity: Preset from config.TRACE_VERBOSITY_PRESETS controlling sampling and previews
+        :param max_bytes: Roll the active file over once it reaches this size (0 disables rotation)
+        :param compression: Compression of rolled segments: "gzip", "zstd" or None
         """
-        self.trace_file = Path(trace_file)
+        base = Path(trace_file)
+        self.run_id = run_id
+        self.trace_file = base.with_name(f"{base.stem}_{run_id}{base.suffix}") if run_id else base
+        preset = config.TRACE_VERBOSITY_PRESETS[verbosity]
+        self.verbosity = verbosity
+        self.sample_rates = preset['sample_rates']
+        self.preview_chars = preset['preview_chars']
+        self.max_bytes = max_bytes
+        if compression == 'zstd' and zstandard is None:
+            compression = 'gzip'
+        self.compression = compression
         self.file_handle = None
+        self.segment = 0
+        self.bytes_written = 0
+        self.dropped = {}
+        self._sample_counts = {}
+        self._compressors = []
         self._initialize_file()
+        if run_id:
+            self._link_latest(base)
+        atexit.register(self.close)
+        self._write_event({
+            'event': 'trace_config',
+            'run_id': run_id,
+            'verbosity': verbosity,
+            'sample_rates': self.sample_rates,
+            'max_bytes': max_bytes,
+            'compression': self.compression
+        })
     
     def _initialize_file(self):
         """Initialize or clear the trace file."""
-        # Create new file (overwrite if exists)
-        with open(self.trace_file, 'w') as f:
-            pass  # Just create/clear the file
+        # Create new file (overwrite if exists); a per-run name keeps runs from clobbering each other
+        self.file_handle = open(self.trace_file, 'w', buffering=config.TRACE_BUFFER_BYTES)
+        self.bytes_written = 0
+    
+    def _link_latest(self, base: Path):
+        """
+        Point trace_file (e.g. logs/trace.jsonl) at this run's file. A regular file left there
+        by older versions is renamed to trace_legacy_<mtime>.jsonl so it is not analyzed by mistake.
+        """
+        try:
+            if base.exists() and not base.is_symlink():
+                mtime = datetime.fromtimestamp(base.stat().st_mtime)
+                legacy = base.with_name(f"{base.stem}_legacy_{mtime:%Y%m%d_%H%M%S}{base.suffix}")
+                os.replace(base, legacy)
+                print(f"Moved old trace {base} to {legacy}")
+            tmp = base.with_name(f".{base.name}.{os.getpid()}")
+            os.symlink(self.trace_file.name, tmp)
+            os.replace(tmp, base)
+        except OSError:
+            pass  # Symlinks are a convenience only (e.g. unsupported on some filesystems)
+    
+    def _keep(self, event: Dict[str, Any]) -> bool:
+        """Decide whether a sampled event type is written."""
+        event_type = event.get('event')
+        rate = self.sample_rates.get(event_type, 1.0)
+        if rate >= 1.0 or event_type in ALWAYS_KEEP_EVENTS:
+            return True
+        if rate > 0.0:
+            details = event.get('details') or {}
+            metadata = details.get('metadata') if isinstance(details.get('metadata'), dict) else {}
+            paper = details.get('pdf_path') or metadata.get('pdf_path')
+            if paper:
+                # Hash on the paper so its start/complete pairs are kept or dropped together
+                key = f"{event.get('agent', '')}|{paper}"
+                if zlib.crc32(key.encode('utf-8')) % 10000 < rate * 10000:
+                    return True
+            else:
+                # Keyless events keep an exact fraction: every time the running count crosses a multiple of 1/rate
+                with self._lock:
+                    count = self._sample_counts.get(event_type, 0) + 1
+                    self._sample_counts[event_type] = count
+                if int(count * rate) > int((count - 1) * rate):
+                    return True
+        with self._lock:
+            self.dropped[event_type] = self.dropped.get(event_type, 0) + 1
+        return False
+    
+    def _preview(self, text: str) -> Optional[str]:
+        """Truncate text to the configured preview length (None when previews are disabled)."""
+        if not self.preview_chars:
+            return None
+        return text[:self.preview_chars] + '...' if len(text) > self.preview_chars else text
     
     def _write_event(self, event: Dict[str, Any]):
         """
@@ -40,14 +143,55 @@ class TraceLogger:
         
         :param event: Dictionary containing event data
         """
+        if not self._keep(event):
+            return
         # Add timestamp if not present
         if 'timestamp' not in event:
             event['timestamp'] = datetime.now().isoformat()
         
         # Write as single line of JSON
+        line = json.dumps(event, default=str) + '\n'
         with self._lock:
-            with open(self.trace_file, 'a') as f:
-                f.write(json.dumps(event, default=str) + '\n')
+            if self.file_handle is None:
+                return
+            self.file_handle.write(line)
+            self.bytes_written += len(line)
+            if event['event'] in _FLUSH_EVENTS:
+                self.file_handle.flush()
+            if self.max_bytes and self.bytes_written >= self.max_bytes:
+                self._rotate()
+    
+    def _rotate(self):
+        """Roll the active file into a numbered segment and compress it in the background."""
+        self.file_handle.close()
+        self.segment += 1
+        rolled = self.trace_file.with_name(f"{self.trace_file.stem}.{self.segment:04d}{self.trace_file.suffix}")
+        os.replace(self.trace_file, rolled)
+        self._initialize_file()
+        if self.compression:
+            worker = threading.Thread(target=_compress_file, args=(rolled, self.compression), daemon=False)
+            worker.start()
+            self._compressors = [t for t in self._compressors if t.is_alive()] + [worker]
+    
+    def flush(self):
+        """Flush buffered events to disk."""
+        with self._lock:
+            if self.file_handle is not None:
+                self.file_handle.flush()
+    
+    def close(self):
+        """Record sampling stats, flush and close the trace, and wait for pending compression."""
+        if self.file_handle is None:
+            return
+        with self._lock:
+            dropped = dict(self.dropped)
+        if dropped:
+            self.log_custom('trace_stats', dropped=dropped)
+        with self._lock:
+            self.file_handle.close()
+            self.file_handle = None
+        for worker in self._compressors:
+            worker.join()
     
     def log_workflow_start(self, config: Dict[str, Any]):
         """Log the start of the workflow."""
@@ -92,29 +236,36 @@ class TraceLogger:
             'event': 'llm_request',
             'agent': agent_name,
             'model': model,
-            'prompt_preview': prompt[:200] + '...' if len(prompt) > 200 else prompt,
+            'prompt_preview': self._preview(prompt),
             'prompt_length': len(prompt),
             'temperature': temperature,
             'seed': seed
         }
         if max_tokens:
             event['max_tokens'] = max_tokens
+        if event['prompt_preview'] is None:
+            del event['prompt_preview']
         self._write_event(event)
     
     def log_llm_response(self, agent_name: str, response: str, 
                         tokens: Optional[Dict[str, int]] = None,
-                        system_fingerprint: Optional[str] = None):
+                        system_fingerprint: Optional[str] = None,
+                        model: Optional[str] = None):
         """Log an LLM API response."""
         event = {
             'event': 'llm_response',
             'agent': agent_name,
-            'response_preview': response[:200] + '...' if len(response) > 200 else response,
+            'response_preview': self._preview(response),
             'response_length': len(response)
         }
         if tokens:
             event['tokens'] = tokens
         if system_fingerprint:
             event['system_fingerprint'] = system_fingerprint
+        if model:
+            event['model'] = model
+        if event['response_preview'] is None:
+            del event['response_preview']
         self._write_event(event)
     
     def log_tool_call(self, agent_name: str, tool_name: str, 
@@ -127,7 +278,8 @@ class TraceLogger:
             'arguments': arguments
         }
         if result:
-            event['result_preview'] = result[:200] + '...' if len(result) > 200 else result
+            if self.preview_chars:
+                event['result_preview'] = self._preview(result)
             event['result_length'] = len(result)
         self._write_event(event)
     
@@ -195,18 +347,60 @@ class TraceLogger:
         self._write_event(event)
 
 
+def _compress_file(path: Path, compression: str):
+    """Compress a rolled trace segment to path.gz / path.zst and remove the original."""
+    if compression == 'zstd':
+        target = path.with_name(path.name + '.zst')
+        with open(path, 'rb') as src, open(target, 'wb') as dst:
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    else:
+        target = path.with_name(path.name + '.gz')
+        with open(path, 'rb') as src, gzip.open(target, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    os.remove(path)
+
+
+def open_trace(path):
+    """Open a trace file or a rolled .gz/.zst segment for binary reading."""
+    path = str(path)
+    if path.endswith('.gz'):
+        return io.BufferedReader(gzip.open(path, 'rb'), 1 << 20)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read .zst trace segments")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')), 1 << 20)
+    return open(path, 'rb', buffering=1 << 20)
+
+
+def trace_segments(trace_file) -> list:
+    """
+    Return the files that make up one run's trace, oldest first:
+    rolled segments (compressed or not) followed by the active file.
+    """
+    trace_file = Path(os.path.realpath(trace_file))
+    segments = sorted(trace_file.parent.glob(f"{trace_file.stem}.[0-9][0-9][0-9][0-9]{trace_file.suffix}*"))
+    # A segment may briefly exist both compressed and uncompressed while being compressed
+    by_number = {}
+    for segment in segments:
+        number = segment.name[len(trace_file.stem) + 1:][:4]
+        if number not in by_number or segment.suffix == trace_file.suffix:
+            by_number[number] = segment
+    return [by_number[n] for n in sorted(by_number)] + ([trace_file] if trace_file.exists() else [])
+
+
 # Singleton pattern
 _global_trace_logger: Optional[TraceLogger] = None
 
 
-def get_trace_logger(trace_file: str = "trace.jsonl") -> TraceLogger:
+def get_trace_logger(trace_file: str = "trace.jsonl", **kwargs) -> TraceLogger:
     """
     Get or create the global trace logger instance.
     
     :param trace_file: Path to the trace file (only used on first call)
+    :param kwargs: Extra TraceLogger options such as run_id and verbosity (only used on first call)
     :return: TraceLogger instance
     """
     global _global_trace_logger
     if _global_trace_logger is None:
-        _global_trace_logger = TraceLogger(trace_file)
+        _global_trace_logger = TraceLogger(trace_file, **kwargs)
     return _global_trace_logger
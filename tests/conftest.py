@@ -0,0 +1,16 @@
+"""
+Shared fixtures: route the global trace logger to a temporary file so tests
+never write into logs/.
+"""
+
+import pytest
+
+from src.utils import trace_logger
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _trace_to_tmp(tmp_path_factory):
+    logger = trace_logger.TraceLogger(str(tmp_path_factory.mktemp("trace") / "trace.jsonl"))
+    trace_logger._global_trace_logger = logger
+    yield logger
+    logger.close()
@@ -0,0 +1,98 @@
+"""
+Tests for the cross-run corpus index.
+"""
+
+import os
+import json
+
+import numpy as np
+import pytest
+
+from src.memory.corpus_index import CorpusIndex, HashingEmbedder
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path / "corpus_index")
+
+
+def test_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    a = embedder.embed("graph neural networks for molecules")
+    assert np.allclose(a, embedder.embed("graph neural networks for molecules"))
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+    assert not embedder.embed("").any()
+
+
+def test_add_and_query_persist_across_instances(index_dir):
+    index = CorpusIndex(index_dir, dim=64)
+    added = index.add_many([
+        ("transformers for protein folding", {"title": "Fold"}, "arxiv:1"),
+        ("reinforcement learning for robot control", {"title": "Robots"}, "arxiv:2"),
+    ])
+    assert added == 2
+
+    reopened = CorpusIndex(index_dir, dim=64)
+    assert len(reopened) == 2
+    hits = reopened.query("robot control with reinforcement learning", k=1)
+    assert hits[0]["id"] == "arxiv:2"
+    assert hits[0]["metadata"]["title"] == "Robots"
+
+
+def test_same_paper_id_is_not_reinserted(index_dir):
+    index = CorpusIndex(index_dir, dim=64)
+    assert index.add("first summary of the paper", {}, "arxiv:1")
+    # A different (e.g. degraded) summary of the same paper keeps the existing row
+    assert not index.add("a shorter second summary", {}, "arxiv:1")
+    assert len(index) == 1
+
+
+def test_query_excludes_ids(index_dir):
+    index = CorpusIndex(index_dir, dim=64)
+    index.add_many([("deep learning survey", None, "a"), ("deep learning review", None, "b")])
+    hits = index.query("deep learning", k=5, exclude_ids={"a"})
+    assert [hit["id"] for hit in hits] == ["b"]
+
+
+def test_rows_from_another_instance_are_picked_up_before_insert(index_dir):
+    first = CorpusIndex(index_dir, dim=64)
+    second = CorpusIndex(index_dir, dim=64)
+    first.add("paper one", {}, "arxiv:1")
+    # second was opened before the insert; it must not duplicate or misalign rows
+    assert second.add_many([("paper one", {}, "arxiv:1"), ("paper two", {}, "arxiv:2")]) == 1
+    reopened = CorpusIndex(index_dir, dim=64)
+    assert len(reopened) == 2
+    assert reopened.query("paper two", k=1)[0]["id"] == "arxiv:2"
+
+
+def test_torn_write_is_trimmed_on_load(index_dir):
+    index = CorpusIndex(index_dir, dim=64)
+    index.add_many([("alpha", None, "a"), ("beta", None, "b")])
+    with open(os.path.join(index_dir, CorpusIndex.METADATA_FILE), "ab") as f:
+        f.write(b'{"id": "c", "text": "gam')
+    with open(os.path.join(index_dir, CorpusIndex.VECTORS_FILE), "ab") as f:
+        f.write(np.zeros(64, dtype=np.float32).tobytes())
+
+    reopened = CorpusIndex(index_dir, dim=64)
+    assert len(reopened) == 2
+    assert os.path.getsize(os.path.join(index_dir, CorpusIndex.VECTORS_FILE)) == 2 * 64 * 4
+    assert reopened.add("gamma", None, "c")
+    with open(os.path.join(index_dir, CorpusIndex.METADATA_FILE)) as f:
+        assert [json.loads(line)["id"] for line in f] == ["a", "b", "c"]
+
+
+def test_ivf_query_matches_brute_force_for_nearest_neighbour(index_dir):
+    index = CorpusIndex(index_dir, dim=64)
+    index.add_many((f"topic {i} words {i * 7} terms {i * 13}", None, f"doc{i}") for i in range(200))
+    index.build_ivf(n_lists=4)
+    hit = index.query("topic 42 words 294 terms 546", k=1, n_probe=4)[0]
+    assert hit["id"] == "doc42"
+
+
+def test_citation_uses_bibliographic_metadata():
+    record = {"id": "arxiv:2101.00001", "metadata": {
+        "title": "A Paper", "authors": ["A. One", "B. Two", "C. Three", "D. Four"],
+        "published": "2021-01-01T00:00:00Z", "arxiv_id": "2101.00001", "pdf_path": "pdfs/paper_1.pdf"
+    }}
+    assert CorpusIndex.citation(record) == "A Paper. A. One, B. Two, C. Three et al. 2021. arXiv:2101.00001"
+    assert CorpusIndex.citation({"id": "x", "metadata": {"pdf_path": "pdfs/paper_1.pdf"}}) == "paper_1.pdf"
@@ -0,0 +1,98 @@
+"""
+Tests for per-role model routing and agent pools (fake agent factory, no network).
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("moya")
+
+from src import config  # noqa: E402
+from src.agents.model_router import AgentPool, ModelRouter  # noqa: E402
+
+
+class FakeAgent:
+    """Agent stand-in that tracks how many calls run at once across the pool."""
+
+    def __init__(self, role, model_name, index, tracker):
+        self.role = role
+        self.model_name = model_name
+        self.index = index
+        self.tracker = tracker
+
+    def handle_message(self, message, **kwargs):
+        with self.tracker["lock"]:
+            self.tracker["active"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+        time.sleep(0.02)
+        with self.tracker["lock"]:
+            self.tracker["active"] -= 1
+        return f"{self.model_name}#{self.index}: {message}"
+
+
+def _factory(tracker, built=None):
+    def factory(role, model_name, index):
+        agent = FakeAgent(role, model_name, index, tracker)
+        if built is not None:
+            built.append(agent)
+        return agent
+    return factory
+
+
+def _tracker():
+    return {"lock": threading.Lock(), "active": 0, "peak": 0}
+
+
+def test_pool_bounds_concurrent_calls_to_its_size():
+    tracker, built = _tracker(), []
+    pool = AgentPool("summarizer", "gpt-4o-mini", 2, _factory(tracker, built))
+    replies = []
+    threads = [threading.Thread(target=lambda i=i: replies.append(pool.handle_message(f"m{i}")))
+               for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 2
+    assert tracker["peak"] == 2
+    assert len(replies) == 6 and all(reply.startswith("gpt-4o-mini#") for reply in replies)
+
+
+def test_acquire_blocks_until_an_agent_is_returned():
+    pool = AgentPool("summarizer", "gpt-4o-mini", 1, _factory(_tracker()))
+    acquired = threading.Event()
+
+    def borrow():
+        with pool.acquire():
+            acquired.set()
+
+    with pool.acquire() as agent:
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        assert not acquired.wait(0.05)
+    thread.join(1)
+    assert acquired.is_set()
+    with pool.acquire() as again:
+        assert again is agent
+
+
+def test_router_merges_overrides_and_describes_roles(monkeypatch):
+    tracker = _tracker()
+    monkeypatch.setattr(ModelRouter, "_build_agent", lambda self, role, model, index: FakeAgent(role, model, index,
+                                                                                                  tracker))
+    router = ModelRouter("key", models={"summarizer": "gpt-4.1-nano", "synthesizer": None},
+                         concurrency={"summarizer": 3, "survey_writer": 0})
+    assert router.describe() == {
+        "summarizer": {"model": "gpt-4.1-nano", "concurrency": 3},
+        "synthesizer": {"model": config.AGENT_MODELS["synthesizer"],
+                        "concurrency": config.AGENT_CONCURRENCY["synthesizer"]},
+        "survey_writer": {"model": config.AGENT_MODELS["survey_writer"],
+                          "concurrency": config.AGENT_CONCURRENCY["survey_writer"]},
+    }
+    pool = router.pool("summarizer")
+    assert router.pool("summarizer") is pool
+    assert (pool.model_name, pool.concurrency) == ("gpt-4.1-nano", 3)
+    with pytest.raises(ValueError):
+        router.pool("reviewer")
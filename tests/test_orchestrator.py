@@ -0,0 +1,114 @@
+"""
+Tests for orchestrator summarization scheduling and run-memory bookkeeping (no network).
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("moya")
+
+from moya.tools.ephemeral_memory import EphemeralMemory  # noqa: E402
+
+from src.memory.run_memory import RunMemoryRepository  # noqa: E402
+from src.orchestrator import ResearchCopilotOrchestrator  # noqa: E402
+from src.utils.token_meter import TokenMeter  # noqa: E402
+
+
+class FakeSummarizer:
+    """Summarizer stand-in recording each call's usage in the orchestrator's token meter."""
+
+    batch_backend = None
+
+    def __init__(self, token_meter, concurrency=4, tokens_per_call=150):
+        self.token_meter = token_meter
+        self.concurrency = concurrency
+        self.tokens_per_call = tokens_per_call
+
+    def estimate_usage(self, text):
+        return "gpt-4o-mini", self.tokens_per_call - 50, 50
+
+    def summarize(self, text, metadata=None):
+        self.token_meter.record("fake", "gpt-4o-mini", {"prompt": self.tokens_per_call - 50, "completion": 50,
+                                                        "total": self.tokens_per_call})
+        return {"summary": f"summary of {text}", "metadata": metadata, "tokens": {"total": self.tokens_per_call}}
+
+
+class SlowSummarizer(FakeSummarizer):
+    """Finishes higher-ranked papers last and tracks the peak number of calls in flight."""
+
+    def __init__(self, token_meter, concurrency=3, papers=6, tokens_per_call=150):
+        super().__init__(token_meter, concurrency, tokens_per_call)
+        self.papers = papers
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.finished = []
+
+    def summarize(self, text, metadata=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        rank = int(text.split()[-1])
+        time.sleep(0.01 * (self.papers - rank))
+        with self.lock:
+            self.active -= 1
+            self.finished.append(rank)
+        return super().summarize(text, metadata)
+
+
+def _parsed(n):
+    return [{"pdf_path": f"pdfs/paper_{i + 1}.pdf", "text": f"text {i}", "rank": i,
+             "metadata": {"pdf_path": f"pdfs/paper_{i + 1}.pdf", "paper_id": f"arxiv:2101.{i:05d}"}}
+            for i in range(n)]
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = RunMemoryRepository(str(tmp_path), run_id="test")
+    previous, EphemeralMemory.memory_repository = EphemeralMemory.memory_repository, repository
+    yield repository
+    EphemeralMemory.memory_repository = previous
+
+
+def _orchestrator(summarizer):
+    orchestrator = ResearchCopilotOrchestrator(None, None, summarizer, None, None)
+    orchestrator.token_meter = summarizer.token_meter
+    return orchestrator
+
+
+def test_artifacts_are_keyed_by_paper_id(repository):
+    summarizer = FakeSummarizer(TokenMeter(max_tokens=None, max_cost=None))
+    _orchestrator(summarizer)._summarize_all(_parsed(3), "t")
+    assert sorted(repository.papers("t")) == ["arxiv:2101.00000", "arxiv:2101.00001", "arxiv:2101.00002"]
+    assert repository.get_artifact("t", "arxiv:2101.00001", "summary")["summary"] == "summary of text 1"
+    assert repository.get_artifact("t", "arxiv:2101.00001", "tokens") == {"total": 150}
+
+
+def test_summaries_keep_rank_order_when_calls_finish_out_of_order(repository):
+    summarizer = SlowSummarizer(TokenMeter(max_tokens=None, max_cost=None), concurrency=3, papers=6)
+    summaries = _orchestrator(summarizer)._summarize_all(_parsed(6), "t")
+    assert [s["summary"] for s in summaries] == [f"summary of text {i}" for i in range(6)]
+    assert summarizer.finished != sorted(summarizer.finished)
+    assert summarizer.peak == 3
+
+
+def test_lower_ranked_papers_are_skipped_once_the_next_does_not_fit(repository):
+    # 1000 tokens at 400 per call: two calls reach 800 (still below critical), a third would not fit
+    meter = TokenMeter(max_tokens=1000, max_cost=None)
+    summarizer = SlowSummarizer(meter, concurrency=2, papers=5, tokens_per_call=400)
+    summaries = _orchestrator(summarizer)._summarize_all(_parsed(5), "t")
+    assert [s["metadata"]["paper_id"] for s in summaries] == ["arxiv:2101.00000", "arxiv:2101.00001"]
+    assert sorted(summarizer.finished) == [0, 1]
+    assert meter.reserved["calls"] == 0
+    assert meter.snapshot()["run"]["total"] == 800
+
+
+def test_calls_in_flight_count_against_the_budget(repository):
+    # Reservations alone reach the critical mark: 6 x 150 of 1000 tokens are reserved before any completes
+    meter = TokenMeter(max_tokens=1000, max_cost=None)
+    summarizer = SlowSummarizer(meter, concurrency=8, papers=9)
+    summaries = _orchestrator(summarizer)._summarize_all(_parsed(9), "t")
+    assert len(summaries) == 6
+    assert meter.snapshot()["run"]["total"] == 900
@@ -0,0 +1,134 @@
+"""
+Tests for arXiv feed paging and prefetching in PDFMinerAgent (no network access).
+"""
+
+import io
+import threading
+
+import pytest
+
+# Importing src.agents loads every agent and their dependencies
+for module in ("requests", "pdfplumber", "moya"):
+    pytest.importorskip(module)
+
+from src import config  # noqa: E402
+from src.agents.pdf_miner_agent import ByteBudget, PDFMinerAgent  # noqa: E402
+
+
+def _entry(n, pdf=True):
+    link = f'<link title="pdf" href="http://arxiv.org/pdf/2101.0000{n}v1"/>' if pdf else ""
+    return (f"<entry><id>http://arxiv.org/abs/2101.0000{n}v1</id><title>Paper\n {n}</title>"
+            f"<author><name>Author {n}</name></author><published>2021-01-0{n}T00:00:00Z</published>{link}</entry>")
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+        self.headers = {"Content-Length": str(len(body))}
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        yield self.raw.read()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.responses = []
+
+    def get(self, url, **kwargs):
+        if "export.arxiv.org" in url:
+            start = int(url.split("start=")[1].split("&")[0])
+            body = '<feed xmlns="http://www.w3.org/2005/Atom">' + "".join(self.pages.get(start, [])) + "</feed>"
+            response = FakeResponse(body.encode())
+        else:
+            response = FakeResponse(b"%PDF-1.4 fake")
+        self.responses.append(response)
+        return response
+
+
+class GatedSession(FakeSession):
+    """Holds every PDF download until the gate opens."""
+
+    def __init__(self, pages):
+        super().__init__(pages)
+        self.gate = threading.Event()
+        self.page_requests = 0
+        self.pdf_requests = 0
+
+    def get(self, url, **kwargs):
+        if "export.arxiv.org" in url:
+            self.page_requests += 1
+        else:
+            self.pdf_requests += 1
+            self.gate.wait(5)
+        return super().get(url, **kwargs)
+
+
+@pytest.fixture
+def miner(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ARXIV_PAGE_DELAY", 0)
+    return PDFMinerAgent("test", str(tmp_path))
+
+
+def test_entry_without_pdf_link_does_not_stop_paging(miner):
+    session = FakeSession({0: [_entry(1), _entry(2, pdf=False), _entry(3)], 3: [_entry(4), _entry(5)]})
+    miner._session = lambda: session
+    paths = [path for _, path in sorted(miner.iter_pdfs(max_papers=4, page_size=3))]
+    assert len(paths) == 4
+    assert [miner.paper_metadata(p)["arxiv_id"] for p in paths] == ["2101.00001", "2101.00003",
+                                                                   "2101.00004", "2101.00005"]
+    assert miner.paper_metadata(paths[0])["title"] == "Paper 1"
+    assert all(response.closed for response in session.responses)
+
+
+def test_search_response_is_closed_when_max_papers_is_reached_mid_page(miner):
+    session = FakeSession({0: [_entry(1), _entry(2), _entry(3)]})
+    miner._session = lambda: session
+    assert len(list(miner.iter_pdfs(max_papers=1, page_size=3))) == 1
+    assert all(response.closed for response in session.responses)
+
+
+def test_byte_budget_blocks_until_bytes_are_released():
+    budget = ByteBudget(100)
+    budget.acquire(60)
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (budget.acquire(60), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    # Shrinking a reservation to the actual size makes room without a release
+    assert budget.resize(60, 30) == 30
+    assert acquired.wait(1)
+    thread.join()
+    assert budget.in_flight == 90
+    budget.release(30)
+    budget.release(60)
+    assert budget.in_flight == 0
+
+
+def test_queued_downloads_and_page_prefetch_are_bounded_by_bytes(miner, monkeypatch):
+    monkeypatch.setattr(config, "PREFETCH_PDF_SIZE_ESTIMATE", 100)
+    monkeypatch.setattr(config, "PREFETCH_MAX_INFLIGHT_BYTES", 200)
+    session = GatedSession({0: [_entry(1), _entry(2)], 2: [_entry(3), _entry(4)], 4: [_entry(5), _entry(6)]})
+    miner._session = lambda: session
+    paths = []
+    consumer = threading.Thread(target=lambda: paths.extend(miner.iter_pdfs(max_papers=6, page_size=2)))
+    consumer.start()
+    try:
+        threading.Event().wait(0.2)
+        # Two estimates fill the budget: the search stops at the first entry of page two
+        # and does not fetch page three until downloads finish
+        assert session.pdf_requests == 2
+        assert session.page_requests == 2
+    finally:
+        session.gate.set()
+        consumer.join(5)
+    assert len(paths) == 6
+    assert session.page_requests == 3
@@ -0,0 +1,116 @@
+"""
+Tests for per-section run profiling.
+"""
+
+import cProfile
+import json
+import pstats
+import threading
+import time
+
+from src.utils.profiler import RunProfiler
+from src.utils.trace_logger import TraceLogger
+
+
+def _busy_parent():
+    return sum(i * i for i in range(20000))
+
+
+def _busy_child():
+    return sum(i * i for i in range(20000))
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        _busy_child()
+
+
+def _profiler(tmp_path, **kwargs):
+    profiler = RunProfiler(str(tmp_path / "profile"), **kwargs)
+    profiler.trace_logger = TraceLogger(str(tmp_path / "trace.jsonl"))
+    return profiler
+
+
+def _events(profiler):
+    """Close the profiler's trace and return its events by type."""
+    profiler.trace_logger.close()
+    events = {}
+    with open(profiler.trace_logger.trace_file) as f:
+        for event in map(json.loads, f):
+            events.setdefault(event["event"], []).append(event)
+    return events
+
+
+def _functions(path):
+    return {func[2] for func in pstats.Stats(path).stats}
+
+
+def test_nested_section_pauses_its_parent(tmp_path):
+    profiler = _profiler(tmp_path, sample_interval=0)
+    with profiler.section("stage:parsing"):
+        _busy_parent()
+        with profiler.section("agent:PDFParserAgent"):
+            _busy_child()
+    files = profiler.finish()
+    assert "_busy_child" in _functions(files["agent:PDFParserAgent"])
+    assert "_busy_parent" not in _functions(files["agent:PDFParserAgent"])
+    assert "_busy_parent" in _functions(files["stage:parsing"])
+    assert "_busy_child" not in _functions(files["stage:parsing"])
+
+
+def test_wrap_profiles_worker_threads(tmp_path):
+    profiler = _profiler(tmp_path, sample_interval=0)
+    summarize = profiler.wrap("agent:SummarizerAgent", _busy_child)
+    results = []
+    for _ in range(2):
+        thread = threading.Thread(target=lambda: results.append(summarize()))
+        thread.start()
+        thread.join()
+    files = profiler.finish()
+    assert len(results) == 2
+    assert "_busy_child" in _functions(files["agent:SummarizerAgent"])
+    section = _events(profiler)["profile_section"][0]
+    assert section["section"] == "agent:SummarizerAgent" and section["profiled_calls"] == 2
+
+
+def test_sections_fall_back_to_wall_time_when_profiling_is_refused(tmp_path, monkeypatch):
+    # Python 3.12+ raises ValueError when another profiler is already active
+    def refuse(self, *args, **kwargs):
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile.Profile, "enable", refuse)
+    profiler = _profiler(tmp_path, sample_interval=0)
+    with profiler.section("stage:summarization"):
+        _spin(0.01)
+    files = profiler.finish()
+    assert files == {}
+    section = _events(profiler)["profile_section"][0]
+    assert section["section"] == "stage:summarization"
+    assert section["wall_time_s"] >= 0.01
+    assert "hot_functions" not in section
+
+
+def test_finish_writes_profiles_stacks_and_trace_events(tmp_path):
+    profiler = _profiler(tmp_path, sample_interval=0.001, top_n=3)
+    profiler.start()
+    with profiler.section("stage:synthesis"):
+        _spin(0.1)
+    with profiler.section("agent:Survey Writer"):
+        _busy_parent()
+    files = profiler.finish()
+    profile_dir = tmp_path / "profile"
+    assert sorted(p.name for p in profile_dir.iterdir()) == ["agent_Survey_Writer.pstats", "all.pstats",
+                                                             "stacks.collapsed", "stage_synthesis.pstats"]
+    assert {"_busy_child", "_busy_parent"} <= _functions(files["all"])
+    stacks = (profile_dir / "stacks.collapsed").read_text().splitlines()
+    assert stacks and all(line.startswith(("stage:synthesis;", "agent:Survey Writer;")) for line in stacks)
+    assert any("test_profiler.py:_spin" in line for line in stacks)
+
+    events = _events(profiler)
+    sections = {e["section"]: e for e in events["profile_section"]}
+    assert set(sections) == {"stage:synthesis", "agent:Survey Writer"}
+    assert 0 < len(sections["stage:synthesis"]["hot_functions"]) <= 3
+    assert sections["stage:synthesis"]["wall_time_s"] >= 0.1
+    assert events["profile_complete"][0]["files"] == files
+    assert events["profile_complete"][0]["samples"] > 0
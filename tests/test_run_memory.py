@@ -0,0 +1,82 @@
+"""
+Tests for the bounded, spill-to-disk run memory.
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("moya")
+
+from src.memory.run_memory import RunMemoryRepository  # noqa: E402
+
+
+def _message(sender, content, metadata=None):
+    return SimpleNamespace(sender=sender, content=content, metadata=metadata)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return RunMemoryRepository(str(tmp_path), run_id="run1", max_resident_papers=2,
+                               max_thread_messages=3, batch_size=2)
+
+
+def test_files_live_in_a_per_run_directory(tmp_path):
+    first = RunMemoryRepository(str(tmp_path), run_id="a")
+    second = RunMemoryRepository(str(tmp_path), run_id="b")
+    assert first.spill_dir != second.spill_dir
+    assert os.path.dirname(first.spill_path) == str(tmp_path / "a")
+
+
+def test_artifacts_spill_and_promote_back(repo):
+    for i in range(5):
+        repo.put_artifact("t", f"p{i}", "summary", {"summary": f"s{i}"})
+    assert repo.stats()["resident_papers"] == 2
+    assert repo.stats()["spilled_papers"] == 3
+
+    # Promoting a spilled paper reads it back at its recorded offset, pending or flushed
+    assert repo.get_artifact("t", "p0", "summary") == {"summary": "s0"}
+    assert repo.get_artifact("t", "p1") == {"summary": {"summary": "s1"}}
+    assert repo.stats()["resident_papers"] == 2
+    assert sorted(repo.papers("t")) == [f"p{i}" for i in range(5)]
+    for i in range(5):
+        assert repo.get_artifact("t", f"p{i}", "summary") == {"summary": f"s{i}"}
+
+
+def test_kinds_merge_across_spills(repo):
+    repo.put_artifact("t", "p0", "parse", {"text_length": 10})
+    repo.put_artifact("t", "p1", "parse", {"text_length": 11})
+    repo.put_artifact("t", "p2", "parse", {"text_length": 12})  # spills p0
+    repo.put_artifact("t", "p0", "summary", {"summary": "s0"})
+    assert repo.get_artifact("t", "p0") == {"parse": {"text_length": 10}, "summary": {"summary": "s0"}}
+
+
+def test_unknown_kind_and_paper(repo):
+    with pytest.raises(ValueError):
+        repo.put_artifact("t", "p0", "bogus", {})
+    assert repo.get_artifact("t", "missing") is None
+
+
+def test_thread_tail_is_bounded_but_all_messages_are_logged(repo):
+    for i in range(5):
+        repo.append_message("t", _message("agent", f"m{i}", {"paper_id": f"p{i}", "kind": "parse",
+                                                            "artifact": {"i": i}}))
+    assert [m.content for m in repo.get_thread("t").messages] == ["m2", "m3", "m4"]
+    assert repo.message_count("t") == 5
+    assert repo.get_artifact("t", "p0", "parse") == {"i": 0}
+
+    repo.flush()
+    with open(repo.message_log_path) as f:
+        logged = [json.loads(line) for line in f]
+    assert [m["content"] for m in logged] == [f"m{i}" for i in range(5)]
+    assert logged[0]["paper_id"] == "p0"
+
+
+def test_delete_thread_drops_resident_and_spilled(repo):
+    for i in range(4):
+        repo.put_artifact("t", f"p{i}", "tokens", {"total": i})
+    repo.delete_thread("t")
+    assert repo.papers("t") == []
+    assert repo.get_thread("t") is None
@@ -0,0 +1,39 @@
+"""
+Tests for the streamed-output file sink.
+"""
+
+from src.utils.stream_sink import StreamSink, partial_path
+
+
+def test_uncommitted_stream_keeps_the_previous_output(tmp_path):
+    output = tmp_path / "survey.md"
+    output.write_text("previous survey")
+    with StreamSink(str(output), echo=False) as sink:
+        sink.write("partial ")
+    assert output.read_text() == "previous survey"
+    assert (tmp_path / "survey.md.part").read_text() == "partial "
+
+
+def test_commit_moves_the_stream_into_place(tmp_path):
+    output = tmp_path / "out" / "survey.md"
+    with StreamSink(str(output), echo=False) as sink:
+        sink.write("new ")
+        sink.write("survey")
+        assert sink.commit()
+    assert output.read_text() == "new survey"
+    assert not (tmp_path / "out" / "survey.md.part").exists()
+
+
+def test_no_tokens_creates_no_files(tmp_path):
+    with StreamSink(str(tmp_path / "survey.md"), echo=False) as sink:
+        assert not sink.commit()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partial_path_is_where_tokens_arrive(tmp_path):
+    output = str(tmp_path / "survey.md")
+    with StreamSink(output, echo=False) as sink:
+        sink.write("live")
+        assert sink.part_path == partial_path(output)
+        with open(partial_path(output)) as f:
+            assert f.read() == "live"
@@ -0,0 +1,136 @@
+"""
+Tests for batch-mode summarization with the file-based backend (no network access).
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+import pytest
+
+# Importing src.agents loads every agent and their dependencies
+for module in ("requests", "pdfplumber", "moya"):
+    pytest.importorskip(module)
+
+from src import config  # noqa: E402
+from src.agents.batch_backend import LocalFileBatchBackend  # noqa: E402
+from src.agents.summarizer_agent import SummarizerAgent  # noqa: E402
+from src.utils.token_meter import TokenMeter  # noqa: E402
+
+
+class FakeAgent:
+    model_name = "gpt-4o-mini"
+    temperature = 0.0
+    seed = 42
+
+
+class FakePool:
+    """AgentPool stand-in; batch mode only reads the model settings of a borrowed agent."""
+
+    model_name = FakeAgent.model_name
+    concurrency = 1
+
+    @contextmanager
+    def acquire(self):
+        yield FakeAgent()
+
+
+class FailingSubmitBackend(LocalFileBatchBackend):
+    """Refuses the first job file it is given."""
+
+    def __init__(self, work_dir):
+        super().__init__(work_dir)
+        self.refused = None
+
+    def submit(self, job_file):
+        if self.refused is None:
+            self.refused = job_file
+            raise RuntimeError("upload rejected")
+        return super().submit(job_file)
+
+
+class FailedLineBackend(LocalFileBatchBackend):
+    """Reports one request as failed in its results, like the Batch API error file."""
+
+    def __init__(self, work_dir, failed_id):
+        super().__init__(work_dir)
+        self.failed_id = failed_id
+
+    def poll(self, batch_id):
+        status = super().poll(batch_id)
+        path = self._path(batch_id, "output.jsonl")
+        with open(path) as f:
+            results = [json.loads(line) for line in f]
+        with open(path, 'w') as f:
+            for result in results:
+                if result["custom_id"] == self.failed_id:
+                    result = {"custom_id": self.failed_id, "response": None,
+                              "error": {"code": "server_error", "message": "boom"}}
+                f.write(json.dumps(result) + "\n")
+        return status
+
+
+def _parsed(n):
+    return [{"pdf_path": f"paper_{i}.pdf", "text": f"text of paper {i}",
+             "metadata": {"pdf_path": f"paper_{i}.pdf"}} for i in range(n)]
+
+
+def _summarizer(tmp_path, backend, max_tokens=None):
+    summarizer = SummarizerAgent(FakePool(), batch_backend=backend, batch_dir=str(tmp_path / "jobs"))
+    summarizer.token_meter = TokenMeter(max_tokens=max_tokens, max_cost=None)
+    return summarizer
+
+
+def _job_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path / "jobs") if not name.endswith("_results.jsonl"))
+
+
+def test_requests_are_split_into_job_files_and_mapped_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_REQUESTS", 2)
+    summarizer = _summarizer(tmp_path, LocalFileBatchBackend(str(tmp_path / "backend")))
+    summaries = summarizer.summarize_batch(_parsed(5))
+    assert len(_job_files(tmp_path)) == 3
+    assert [s["summary"] for s in summaries] == [f"[local batch] text of paper {i}" for i in range(5)]
+    assert [s["metadata"]["pdf_path"] for s in summaries] == [f"paper_{i}.pdf" for i in range(5)]
+    assert summarizer.token_meter.snapshot()["run"]["calls"] == 5
+    assert summarizer.token_meter.reserved["calls"] == 0
+
+
+def test_job_files_respect_the_byte_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_BYTES", 600)
+    summarizer = _summarizer(tmp_path, LocalFileBatchBackend(str(tmp_path / "backend")))
+    summaries = summarizer.summarize_batch(_parsed(4))
+    jobs = _job_files(tmp_path)
+    assert len(jobs) > 1
+    assert all(os.path.getsize(tmp_path / "jobs" / job) <= 600 for job in jobs)
+    assert all(s["summary"] for s in summaries)
+
+
+def test_failed_result_line_leaves_only_that_summary_empty(tmp_path):
+    summarizer = _summarizer(tmp_path, FailedLineBackend(str(tmp_path / "backend"), "paper-1"))
+    summaries = summarizer.summarize_batch(_parsed(3))
+    assert [bool(s["summary"]) for s in summaries] == [True, False, True]
+    assert summaries[1]["tokens"] is None
+
+
+def test_failed_submit_skips_only_that_job_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_REQUESTS", 2)
+    backend = FailingSubmitBackend(str(tmp_path / "backend"))
+    summarizer = _summarizer(tmp_path, backend)
+    summaries = summarizer.summarize_batch(_parsed(4))
+    assert backend.refused.endswith("_0000.jsonl")
+    assert [bool(s["summary"]) for s in summaries] == [False, False, True, True]
+    assert summarizer.token_meter.reserved["calls"] == 0
+
+
+def test_papers_beyond_the_budget_are_not_submitted(tmp_path):
+    summarizer = _summarizer(tmp_path, LocalFileBatchBackend(str(tmp_path / "backend")))
+    _, prompt_tokens, completion_tokens = summarizer.estimate_usage("text of paper 0")
+    # Room for two papers' reservations but not a third
+    summarizer.token_meter.max_tokens = 2 * (prompt_tokens + completion_tokens) + 1
+    summaries = summarizer.summarize_batch(_parsed(4))
+    with open(tmp_path / "jobs" / _job_files(tmp_path)[0]) as f:
+        submitted = [json.loads(line)["custom_id"] for line in f]
+    assert submitted == ["paper-0", "paper-1"]
+    assert [bool(s["summary"]) for s in summaries] == [True, True, False, False]
+    assert summarizer.token_meter.reserved["calls"] == 0
@@ -0,0 +1,98 @@
+"""
+Tests for the per-run token/cost meter and budget levels.
+"""
+
+import threading
+
+import pytest
+
+from src import config
+from src.utils.token_meter import BudgetExceededError, TokenMeter, llm_cost
+
+
+def _tokens(prompt, completion):
+    return {"prompt": prompt, "completion": completion, "total": prompt + completion}
+
+
+def test_llm_cost_uses_pricing_and_dated_snapshots():
+    prompt_price, completion_price = config.MODEL_PRICING["gpt-4o"]
+    expected = (1000 * prompt_price + 500 * completion_price) / 1_000_000
+    assert llm_cost("gpt-4o", 1000, 500) == pytest.approx(expected)
+    assert llm_cost("gpt-4o-2024-08-06", 1000, 500) == pytest.approx(expected)
+    # The longest base model wins, not the first prefix in MODEL_PRICING (gpt-4o, gpt-4.1)
+    for snapshot, base in (("gpt-4o-mini-2024-07-18", "gpt-4o-mini"),
+                           ("gpt-4.1-mini-2025-04-14", "gpt-4.1-mini"),
+                           ("gpt-4.1-nano-2025-04-14", "gpt-4.1-nano")):
+        assert llm_cost(snapshot, 1000, 500) == pytest.approx(llm_cost(base, 1000, 500))
+    assert llm_cost("gpt-4o-mini-2024-07-18", 1000, 500) < expected
+    assert llm_cost("unknown-model", 1000, 500) == 0.0
+
+
+def test_usage_is_attributed_per_agent_and_model():
+    meter = TokenMeter(max_tokens=None, max_cost=None)
+    with meter.attribute("SummarizerAgent"):
+        meter.record("openai_agent_summarizer", "gpt-4o-mini", _tokens(100, 50))
+    meter.record("SynthesizerAgent", "gpt-4o", _tokens(10, 5))
+    snapshot = meter.snapshot()
+    assert snapshot["run"]["total"] == 165
+    assert snapshot["by_agent"]["SummarizerAgent"]["calls"] == 1
+    assert snapshot["by_agent"]["SynthesizerAgent"]["total"] == 15
+    assert set(snapshot["by_model"]) == {"gpt-4o-mini", "gpt-4o"}
+    assert meter.budget_level() == "normal"
+
+
+def test_budget_levels_escalate_and_block_when_exhausted():
+    meter = TokenMeter(max_tokens=1000, max_cost=None)
+    levels = []
+    for _ in range(4):
+        meter.check()
+        meter.record("agent", "gpt-4o", _tokens(150, 100))
+        levels.append(meter.budget_level())
+    assert levels == ["normal", "normal", "degraded", "exhausted"]
+    with pytest.raises(BudgetExceededError):
+        meter.check()
+
+
+def test_cost_budget_uses_the_tightest_limit():
+    meter = TokenMeter(max_tokens=10_000_000, max_cost=0.01)
+    meter.record("agent", "gpt-4o", _tokens(2000, 500))  # $0.01
+    assert meter.budget_used() == pytest.approx(1.0)
+    assert meter.budget_level() == "exhausted"
+
+
+def test_concurrent_records_are_not_lost():
+    meter = TokenMeter(max_tokens=None, max_cost=None)
+
+    def record():
+        for _ in range(500):
+            meter.record("agent", "gpt-4o-mini", _tokens(1, 1))
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert meter.snapshot()["run"] == {"calls": 4000, "prompt": 4000, "completion": 4000,
+                                       "total": 8000, "cost": pytest.approx(4000 * llm_cost("gpt-4o-mini", 1, 1))}
+
+
+def test_reservations_raise_the_level_but_not_the_hard_stop():
+    meter = TokenMeter(max_tokens=1000, max_cost=None)
+    first = meter.reserve("gpt-4o-mini", 400, 200)
+    assert meter.budget_level() == "degraded"
+    assert meter.fits("gpt-4o-mini", 300, 100)
+    assert not meter.fits("gpt-4o-mini", 300, 200)
+    second = meter.reserve("gpt-4o-mini", 300, 100)
+    assert meter.budget_level() == "critical"
+    meter.check()  # Only actual usage can exhaust the budget
+
+    meter.record("agent", "gpt-4o-mini", _tokens(400, 150))
+    meter.release(first)
+    meter.release(second)
+    assert meter.reserved["calls"] == 0
+    assert meter.budget_level() == "normal"
+    assert meter.snapshot()["reserved"]["total"] == 0
+
+
+def test_fallback_model_is_cheaper_than_the_summarizer_model():
+    assert llm_cost(config.BUDGET_FALLBACK_MODEL, 1000, 1000) < llm_cost(config.AGENT_MODELS["summarizer"], 1000, 1000)
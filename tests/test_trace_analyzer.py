@@ -0,0 +1,119 @@
+"""
+Tests for the streaming trace analyzer.
+"""
+
+import gzip
+import json
+
+import pytest
+
+from src.utils.trace_analyzer import analyze_trace, diff_traces
+
+
+def _event(second, event, **fields):
+    return json.dumps({"event": event, "timestamp": f"2026-01-01T00:00:{second:02d}", **fields}) + "\n"
+
+
+def _trace(llm_tokens=100):
+    return [
+        _event(0, "workflow_start", config={}),
+        _event(0, "decision", component="Orchestrator", decision="start_parsing"),
+        _event(1, "agent_action", agent="PDFParserAgent", action="parse_start", details={"pdf_path": "a.pdf"}),
+        _event(3, "agent_action", agent="PDFParserAgent", action="parse_complete", details={"pdf_path": "a.pdf"}),
+        _event(3, "memory_operation", operation="store"),
+        _event(4, "decision", component="Orchestrator", decision="start_summarization"),
+        _event(4, "agent_action", agent="SummarizerAgent", action="summarize_start",
+               details={"metadata": {"pdf_path": "a.pdf"}}),
+        _event(5, "llm_request", agent="summarizer", model="gpt-4o-mini"),
+        _event(6, "llm_response", agent="summarizer", model="gpt-4o-mini",
+               tokens={"prompt": llm_tokens, "completion": llm_tokens, "total": 2 * llm_tokens}),
+        _event(7, "agent_action", agent="SummarizerAgent", action="summarize_complete",
+               details={"metadata": {"pdf_path": "a.pdf"}}),
+        _event(8, "pdf_operation", agent="PDFParserAgent", operation="parse", success=False),
+        _event(8, "error", agent="SummarizerAgent", error_message="boom"),
+        "not json at all\n",
+        _event(10, "workflow_complete", success=True),
+    ]
+
+
+def _write(path, lines):
+    path.write_text("".join(lines))
+    return str(path)
+
+
+def test_metrics_from_a_small_trace(tmp_path):
+    metrics = analyze_trace(_write(tmp_path / "trace.jsonl", _trace()))
+    assert metrics["duration_s"] == 10.0
+    assert metrics["events"]["memory_operation"] == 1
+    assert metrics["malformed_lines"] == 1
+    assert metrics["llm"]["totals"]["total"] == 200
+    assert metrics["llm"]["by_model"]["gpt-4o-mini"]["cost"] == pytest.approx((100 * 0.15 + 100 * 0.60) / 1e6)
+    assert metrics["agents"]["SummarizerAgent"] == {"actions": 2, "errors": 1, "error_rate": 0.3333}
+    assert metrics["pdf_operations"]["PDFParserAgent:parse"] == {"ok": 0, "failed": 1}
+    # 2s parsing + 3s summarizing
+    assert metrics["slowest_papers"] == [{"paper": "a.pdf", "seconds": 5.0}]
+    assert [(t["stage"], t["duration_s"]) for t in metrics["timeline"]] == [("parsing", 4.0),
+                                                                            ("summarization", 6.0)]
+
+
+def test_response_model_wins_over_interleaved_requests(tmp_path):
+    lines = [
+        _event(0, "llm_request", agent="summarizer", model="gpt-4o-mini"),
+        _event(0, "llm_request", agent="summarizer", model="gpt-4o"),
+        _event(1, "llm_response", agent="summarizer", model="gpt-4o-mini",
+               tokens={"prompt": 10, "completion": 10, "total": 20}),
+        _event(1, "llm_response", agent="summarizer", model="gpt-4o",
+               tokens={"prompt": 10, "completion": 10, "total": 20}),
+    ]
+    metrics = analyze_trace(_write(tmp_path / "trace.jsonl", lines))
+    assert set(metrics["llm"]["by_model"]) == {"gpt-4o-mini", "gpt-4o"}
+
+
+def test_rolled_gzip_segments_are_included(tmp_path):
+    lines = _trace()
+    with gzip.open(tmp_path / "trace_run.0001.jsonl.gz", "wt") as f:
+        f.write("".join(lines[:7]))
+    metrics = analyze_trace(_write(tmp_path / "trace_run.jsonl", lines[7:]))
+    assert metrics["duration_s"] == 10.0
+    assert metrics["slowest_papers"][0]["seconds"] == 5.0
+
+
+def test_diff_flags_regressions(tmp_path):
+    baseline = analyze_trace(_write(tmp_path / "base.jsonl", _trace(llm_tokens=100)))
+    current = analyze_trace(_write(tmp_path / "cur.jsonl", _trace(llm_tokens=150)))
+    rows = {row["metric"]: row for row in diff_traces(current, baseline, threshold=0.10)}
+    assert rows["llm.total"]["regression"]
+    assert rows["llm.total"]["change"] == pytest.approx(0.5)
+    assert not rows["duration_s"]["regression"]
+
+
+def test_bad_timestamp_is_counted_as_malformed(tmp_path):
+    lines = _trace()
+    lines.insert(3, json.dumps({"event": "agent_action", "timestamp": "yesterday", "agent": "X"}) + "\n")
+    lines.insert(3, json.dumps({"event": "agent_action", "timestamp": None, "agent": "X"}) + "\n")
+    metrics = analyze_trace(_write(tmp_path / "trace.jsonl", lines))
+    assert metrics["malformed_lines"] == 3
+    assert "X" not in metrics["agents"]
+    assert metrics["duration_s"] == 10.0
+
+
+def test_sampled_error_rate_is_scaled_to_the_sample_rate(tmp_path):
+    full = [_event(0, "workflow_start", config={})]
+    full += [_event(1, "agent_action", agent="Worker", action="step") for _ in range(12)]
+    full += [_event(2, "error", agent="Worker", error_message="boom") for _ in range(4)]
+    sampled = [_event(0, "trace_config", sample_rates={"agent_action": 0.25})]
+    sampled += [_event(1, "agent_action", agent="Worker", action="step") for _ in range(3)]
+    sampled += [_event(2, "error", agent="Worker", error_message="boom") for _ in range(4)]
+    baseline = analyze_trace(_write(tmp_path / "full.jsonl", full))
+    current = analyze_trace(_write(tmp_path / "sampled.jsonl", sampled))
+    assert current["agents"]["Worker"]["error_rate"] == baseline["agents"]["Worker"]["error_rate"] == 0.25
+    rows = {row["metric"]: row for row in diff_traces(current, baseline)}
+    assert not rows["agent.Worker.error_rate"]["regression"]
+
+
+def test_error_rate_is_skipped_when_actions_are_not_traced(tmp_path):
+    lines = [_event(0, "trace_config", sample_rates={"agent_action": 0.0}),
+             _event(1, "error", agent="Worker", error_message="boom")]
+    metrics = analyze_trace(_write(tmp_path / "trace.jsonl", lines))
+    assert metrics["agents"]["Worker"]["error_rate"] is None
+    assert "agent.Worker.error_rate" not in {row["metric"] for row in diff_traces(metrics, metrics)}
@@ -0,0 +1,82 @@
+"""
+Tests for per-run trace files, rotation and sampling.
+"""
+
+import json
+import os
+import threading
+
+from src.utils.trace_logger import TraceLogger, open_trace, trace_segments
+
+
+def test_latest_link_replaces_a_legacy_regular_file(tmp_path):
+    base = tmp_path / "trace.jsonl"
+    base.write_text('{"event": "old"}\n')
+    logger = TraceLogger(str(base), run_id="r1")
+    logger.close()
+    assert base.is_symlink()
+    assert os.readlink(base) == "trace_r1.jsonl"
+    legacy = list(tmp_path.glob("trace_legacy_*.jsonl"))
+    assert len(legacy) == 1 and legacy[0].read_text() == '{"event": "old"}\n'
+
+
+def test_rotation_keeps_every_event_across_segments(tmp_path):
+    logger = TraceLogger(str(tmp_path / "trace.jsonl"), run_id="r", max_bytes=2000, compression="gzip")
+    for i in range(100):
+        logger.log_custom("tick", i=i)
+    logger.close()
+    segments = trace_segments(logger.trace_file)
+    assert len(segments) > 1
+    ticks = []
+    for segment in segments:
+        with open_trace(segment) as f:
+            ticks += [json.loads(line)["i"] for line in f if b'"tick"' in line]
+    assert ticks == list(range(100))
+
+
+def test_dropped_counts_are_exact_under_concurrent_writers(tmp_path):
+    logger = TraceLogger(str(tmp_path / "trace.jsonl"), run_id="r")
+    logger.sample_rates = {"memory_operation": 0.0}
+
+    def write():
+        for _ in range(2000):
+            logger.log_memory_operation("store", "t", "m", "agent")
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert logger.dropped == {"memory_operation": 8000}
+    logger.close()
+    with open(logger.trace_file) as f:
+        stats = [json.loads(line) for line in f if '"trace_stats"' in line]
+    assert stats[0]["dropped"] == {"memory_operation": 8000}
+
+
+def test_keyless_actions_keep_the_sampled_fraction(tmp_path):
+    logger = TraceLogger(str(tmp_path / "trace.jsonl"), run_id="r")
+    logger.sample_rates = {"agent_action": 0.25}
+    for agent in ("PDFParserAgent", "SummarizerAgent", "Orchestrator"):
+        for i in range(100):
+            logger.log_agent_action(agent, "step", {"i": i})
+    logger.close()
+    with open(logger.trace_file) as f:
+        kept = [e for e in map(json.loads, f) if e["event"] == "agent_action"]
+    assert len(kept) == 75
+    assert logger.dropped == {"agent_action": 225}
+
+
+def test_paper_actions_keep_start_and_complete_together(tmp_path):
+    logger = TraceLogger(str(tmp_path / "trace.jsonl"), run_id="r")
+    logger.sample_rates = {"agent_action": 0.25}
+    for i in range(200):
+        logger.log_agent_action("PDFParserAgent", "parse_start", {"pdf_path": f"{i}.pdf"})
+        logger.log_agent_action("PDFParserAgent", "parse_complete", {"pdf_path": f"{i}.pdf"})
+    logger.close()
+    with open(logger.trace_file) as f:
+        kept = [e for e in map(json.loads, f) if e["event"] == "agent_action"]
+    starts = {e["details"]["pdf_path"] for e in kept if e["action"] == "parse_start"}
+    completes = {e["details"]["pdf_path"] for e in kept if e["action"] == "parse_complete"}
+    assert starts == completes
+    assert 20 < len(starts) < 80